@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+
+"""Benchmarks for bread's parse, attribute access, write and as_native.
+
+Each benchmark parses a representative spec, and each operation on it is
+timed by running it repeatedly and keeping the best of several runs. Results
+are reported as per-operation latency, records per second and bytes per
+second, along with the peak memory used to parse one record.
+
+Usage:
+
+    python benchmarks/run_benchmarks.py [--save FILE] [--compare FILE]
+
+--save writes the results to FILE as JSON so that they can be used as a
+baseline, and --compare reports how the results differ from a baseline saved
+earlier.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import bread as b  # noqa: E402
+
+# Operations slower than the baseline by more than this fraction are flagged
+# as regressions when comparing against a baseline
+REGRESSION_THRESHOLD = 0.1
+
+flat_struct = [
+    {"endianness": b.BIG_ENDIAN},
+    ("flag_one", b.boolean),
+    ("flag_two", b.boolean),
+    ("flag_three", b.boolean),
+    ("flag_four", b.boolean),
+    ("first", b.uint8),
+    (b.padding(2),),
+    b.padding(2),
+    ("blah", b.uint16),
+    ("second", b.int64),
+    ("third", b.uint64),
+    ("fourth", b.int8)
+]
+
+nested_array_struct = [
+    {"endianness": b.BIG_ENDIAN},
+    ("first", b.uint8),
+    ("matrix", b.array(3, b.array(3, b.uint8))),
+    ("last", b.uint8)
+]
+
+deeply_nested_struct = [
+    {"endianness": b.BIG_ENDIAN},
+    ("ubermatrix", b.array(3, nested_array_struct)),
+    ("dummy", [("length", b.uint8), ("ok", b.boolean)]),
+    b.padding(7)
+]
+
+conditional_array_struct = [
+    ("cond", b.boolean),
+    ("foos", b.array(64, (b.CONDITIONAL, "cond", {
+        True: [("foo", b.uint8), ("bar", b.uint8)],
+        False: [("baz", b.uint16)]
+    }))),
+    b.padding(7)
+]
+
+# Modeled on an LSDJ song: large tables of notes, names and instruments whose
+# fields depend on the instrument's type
+instrument = [
+    ("instrument_type", b.enum(8, {
+        0: 'pulse',
+        1: 'wave',
+        2: 'kit',
+        3: 'noise'
+    })),
+    (b.CONDITIONAL, "instrument_type", {
+        'pulse': [
+            ("envelope", b.byte),
+            ("phase_transpose", b.byte),
+            ("has_sound_length", b.boolean),
+            ("sound_length", b.intX(7)),
+            ("sweep", b.byte),
+            ("vibrato", b.nibble),
+            ("wave", b.semi_nibble),
+            ("pan", b.semi_nibble),
+            ("table", b.byte),
+            b.padding(8 * 9)
+        ],
+        'wave': [
+            ("volume", b.byte),
+            ("synth", b.nibble),
+            ("repeat", b.nibble),
+            ("table", b.byte),
+            b.padding(8 * 12)
+        ],
+        'kit': [
+            ("volume", b.byte),
+            ("kit_1", b.byte),
+            ("kit_2", b.byte),
+            ("length_1", b.byte),
+            ("length_2", b.byte),
+            ("pitch", b.int8),
+            b.padding(8 * 9)
+        ],
+        'noise': [
+            ("envelope", b.byte),
+            ("s_cmd", b.enum(8, {0: 'free', 1: 'stable'})),
+            ("sound_length", b.byte),
+            b.padding(8 * 12)
+        ]
+    })
+]
+
+song_struct = [
+    ("phrase_notes", b.array(0xff, b.array(16, b.byte))),
+    ("bookmarks", b.array(64, b.byte)),
+    ("instrument_names", b.array(64, b.string(5))),
+    ("tables", b.array(32, b.array(16, b.nibble))),
+    ("instruments", b.array(64, instrument)),
+    ("tempo", b.byte)
+]
+
+
+def _flat_data():
+    return bytearray(range(21))
+
+
+def _deeply_nested_data():
+    return bytearray(range(34)) + bytearray([0x80])
+
+
+def _conditional_array_data():
+    return bytearray([0x80] + list(range(128)))
+
+
+def _song_data():
+    data = bytearray()
+
+    data += bytearray(i % 0x80 for i in range(0xff * 16))
+    data += bytearray(range(64))
+    data += b''.join(
+        ('inst%d' % (i % 10)).encode('utf-8') for i in range(64))
+    data += bytearray(i % 0xff for i in range(32 * 8))
+
+    for i in range(64):
+        data += bytearray([i % 4]) + bytearray((i + j) % 2 for j in range(15))
+
+    data += bytearray([120])
+
+    return data
+
+
+class Benchmark(object):
+    def __init__(self, name, spec, data, field_path):
+        self.name = name
+        self.spec = spec
+        self.data = data
+
+        # The field read by the attribute access benchmark
+        self.field_path = field_path
+
+    def access(self, parsed):
+        value = parsed
+
+        for component in self.field_path:
+            if type(component) == int:
+                value = value[component]
+            else:
+                value = getattr(value, component)
+
+        return value
+
+
+BENCHMARKS = [
+    Benchmark('flat', flat_struct, _flat_data(), ['third']),
+    Benchmark('deeply_nested', deeply_nested_struct, _deeply_nested_data(),
+              ['ubermatrix', 2, 'matrix', 1, 1]),
+    Benchmark('conditional_array', conditional_array_struct,
+              _conditional_array_data(), ['foos', 63, 'bar']),
+    Benchmark('song', song_struct, _song_data(),
+              ['instruments', 42, 'volume']),
+]
+
+
+def time_operation(operation, min_time, repeats=5):
+    """Return the best time in seconds that one call to `operation` took,
+    over `repeats` runs of at least `min_time` seconds each"""
+    best = None
+
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+
+        while True:
+            operation()
+            calls += 1
+            elapsed = time.perf_counter() - start
+
+            if elapsed >= min_time:
+                break
+
+        per_call = elapsed / calls
+
+        if best is None or per_call < best:
+            best = per_call
+
+    return best
+
+
+def peak_parse_memory(benchmark):
+    tracemalloc.start()
+
+    try:
+        parsed = b.parse(benchmark.data, benchmark.spec)
+        parsed.as_native()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(benchmark, min_time):
+    parsed = b.parse(benchmark.data, benchmark.spec)
+
+    operations = {
+        'parse': lambda: b.parse(benchmark.data, benchmark.spec),
+        'access': lambda: benchmark.access(parsed),
+        'write': lambda: b.write(parsed),
+        'as_native': parsed.as_native,
+    }
+
+    results = {}
+
+    for operation_name in sorted(operations.keys()):
+        latency = time_operation(operations[operation_name], min_time)
+
+        results[operation_name] = {
+            'latency': latency,
+            'records_per_sec': 1.0 / latency,
+            'bytes_per_sec': len(benchmark.data) / latency,
+        }
+
+    results['parse']['peak_memory'] = peak_parse_memory(benchmark)
+
+    return results
+
+
+def _format_latency(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '%.2f %s' % (seconds / scale, unit)
+
+    return '%.2f ns' % (seconds / 1e-9)
+
+
+def report(results, baseline=None):
+    header = '%-20s %-10s %12s %14s %14s %12s' % (
+        'benchmark', 'operation', 'latency', 'records/sec', 'MB/sec',
+        'peak memory')
+
+    if baseline is not None:
+        header += ' %10s' % ('vs. base')
+
+    lines = [header, '-' * len(header)]
+    regressions = []
+
+    for name in sorted(results.keys()):
+        for operation_name in sorted(results[name].keys()):
+            result = results[name][operation_name]
+
+            if 'peak_memory' in result:
+                peak_memory = '%.1f KiB' % (result['peak_memory'] / 1024.0)
+            else:
+                peak_memory = ''
+
+            line = '%-20s %-10s %12s %14.1f %14.3f %12s' % (
+                name, operation_name, _format_latency(result['latency']),
+                result['records_per_sec'],
+                result['bytes_per_sec'] / 1e6, peak_memory)
+
+            if baseline is not None:
+                try:
+                    base_latency = baseline[name][operation_name]['latency']
+                except KeyError:
+                    line += ' %10s' % ('new')
+                else:
+                    change = result['latency'] / base_latency - 1
+                    line += ' %+9.1f%%' % (change * 100)
+
+                    if change > REGRESSION_THRESHOLD:
+                        regressions.append((name, operation_name, change))
+
+            lines.append(line)
+
+    if regressions:
+        lines.append('')
+        lines.append('Regressions (more than %d%% slower than baseline):' % (
+            REGRESSION_THRESHOLD * 100))
+
+        for name, operation_name, change in regressions:
+            lines.append('  %s %s: %+.1f%%' % (
+                name, operation_name, change * 100))
+
+    return '\n'.join(lines), regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark bread operations')
+    parser.add_argument('--save', help='save results to this file')
+    parser.add_argument(
+        '--compare', help='compare results to a baseline saved with --save')
+    parser.add_argument(
+        '--min-time', type=float, default=0.1,
+        help='minimum time in seconds to spend on each timing run')
+    parser.add_argument(
+        '--filter', default='',
+        help='only run benchmarks whose names contain this string')
+
+    args = parser.parse_args()
+
+    results = {}
+
+    for benchmark in BENCHMARKS:
+        if args.filter in benchmark.name:
+            results[benchmark.name] = run_benchmark(benchmark, args.min_time)
+
+    baseline = None
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as fp:
+            baseline = json.load(fp)
+
+    report_text, regressions = report(results, baseline)
+    print(report_text)
+
+    if args.save is not None:
+        with open(args.save, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
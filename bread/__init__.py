@@ -1,3 +1,8 @@
+import importlib
+import sys
+
+# The modules needed to write specs are imported with bread itself; the
+# rest (and the libraries they use) are imported when they're first used
 from .constants import *
 from .utils import *
 from .field import *
@@ -8,10 +13,96 @@ from .string import *
 from .boolean import *
 from .padding import *
 from .enum import *
-from .lifecycle import *
 
 __title__ = 'bread'
 __version__ = '3.1.0'
 __author__ = 'Alex Rasmussen'
 __license__ = 'MIT'
 __copyright__ = 'Copyright 2015 Alex Rasmussen'
+
+# The modules that are imported on first use, in the order that their names
+# would have been imported if they weren't
+_LAZY_MODULES = [
+    'batch', 'layout', 'projection', 'lifecycle', 'compression', 'records',
+    'index', 'patching', 'columns', 'registry', 'buffer', 'parallel',
+    'profiling', 'eager', 'memo'
+]
+
+_LAZY_NAMES = {
+    'TrackedBits': 'batch',
+    'compile_layout': 'layout',
+    'parse_path': 'layout',
+    'resolve_field': 'layout',
+    'static_length': 'layout',
+    'project': 'projection',
+    'new': 'lifecycle',
+    'parse': 'lifecycle',
+    'write': 'lifecycle',
+    'write_changes': 'lifecycle',
+    'COMPRESSION_FORMATS': 'compression',
+    'detect_compression': 'compression',
+    'stream_chunks': 'compression',
+    'iter_parse': 'records',
+    'scan': 'records',
+    'RecordIndex': 'index',
+    'build_index': 'index',
+    'load_index': 'index',
+    'patch': 'patching',
+    'Columns': 'columns',
+    'array_to_numpy': 'columns',
+    'to_columns': 'columns',
+    'register_spec': 'registry',
+    'registered_spec': 'registry',
+    'BufferBits': 'buffer',
+    'CopyOnWriteBits': 'buffer',
+    'WindowedBits': 'buffer',
+    'map_array': 'parallel',
+    'Profile': 'profiling',
+    'profile': 'profiling',
+    'decode_eagerly': 'eager',
+    'DecodeMemo': 'memo',
+}
+
+
+def _import_lazy_modules():
+    # Makes every name that `from .module import *` would have defined
+    # available, for names that aren't listed in _LAZY_NAMES
+    for module_name in _LAZY_MODULES:
+        module = importlib.import_module('.' + module_name, __name__)
+
+        for name, value in vars(module).items():
+            if name[0] != '_' and name not in _LAZY_NAMES:
+                globals().setdefault(name, value)
+
+
+def __getattr__(name):
+    if name in _LAZY_MODULES:
+        return importlib.import_module('.' + name, __name__)
+
+    if name in _LAZY_NAMES:
+        module = importlib.import_module('.' + _LAZY_NAMES[name], __name__)
+        value = getattr(module, name)
+    else:
+        _import_lazy_modules()
+
+        if name not in globals():
+            raise AttributeError(
+                "module '%s' has no attribute '%s'" % (__name__, name))
+
+        value = globals()[name]
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES) | set(_LAZY_MODULES))
+
+
+# Module-level __getattr__ isn't supported before Python 3.7
+if sys.version_info < (3, 7):
+    _import_lazy_modules()
+
+    for _name, _module_name in _LAZY_NAMES.items():
+        globals()[_name] = getattr(sys.modules[__name__ + '.' + _module_name],
+                                   _name)
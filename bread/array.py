@@ -1,27 +1,84 @@
-from .vendor.six.moves import range
-
 from .struct import BreadConditional
 from .constants import CONDITIONAL
 from .struct import build_struct
-from .utils import indent_text
+from .utils import _raw_bytes, _string_types, indent_text
+
+
+# Marks arrays whose items' lengths depend on the data
+_VARIABLE_LENGTH = -1
 
 
 class BreadArray(object):
     def __init__(self, num_items, parent, item_spec, field_options):
-        self._num_items = num_items
+        # If the number of items is the name of a field, the number of items
+        # is that field's value in the parent struct
+        self._length_field_name = None
+
+        if isinstance(num_items, _string_types):
+            self._length_field_name = num_items
+            num_items = 0
+
         self.__offset = None
         self._name = None
         self.__item_length = None
-        self._accessor_items = [None] * self._num_items
+        self.__num_items = num_items
+
+        # The total length of the items, if they're not all the same length,
+        # computed when they're laid out
+        self.__variable_length = None
+
+        # Items by index, created when they're first accessed
+        self._accessor_items = {}
         self._item_spec = item_spec
         self._parent = parent
         self._data_bits = None
         self._field_options = field_options
 
+    @property
+    def _num_items(self):
+        # The field holding the number of items can only be read once the
+        # array (and so the field before it) has been laid out
+        if (self._length_field_name is not None and
+                self._data_bits is not None and self.__offset is not None):
+            num_items = getattr(self._parent, self._length_field_name)
+
+            if num_items != self.__num_items:
+                self._resize(num_items)
+
+        return self.__num_items
+
+    def _resize(self, num_items):
+        if num_items < 0:
+            raise ValueError(
+                "Array can't have %d items (from field '%s')" %
+                (num_items, self._length_field_name))
+
+        for index in list(self._accessor_items.keys()):
+            if index >= num_items:
+                del self._accessor_items[index]
+
+        self.__num_items = num_items
+        self.__variable_length = None
+
+        if self.__offset is not None:
+            # Lay out any new items
+            self._offset = self.__offset
+
     @property
     def _item_length(self):
+        """The length of every item, or None if items' lengths depend on the
+        data (e.g. if they're conditionals)"""
         if self.__item_length is None:
-            self.__item_length = self._get_accessor_item(0)._length
+            # Imported here because layout depends on this module
+            from .layout import static_length
+
+            self.__item_length = static_length(self._get_accessor_item(0))
+
+            if self.__item_length is None:
+                self.__item_length = _VARIABLE_LENGTH
+
+        if self.__item_length is _VARIABLE_LENGTH:
+            return None
 
         return self.__item_length
 
@@ -32,15 +89,53 @@ class BreadArray(object):
     @_offset.setter
     def _offset(self, offset):
         self.__offset = offset
+        self.__variable_length = None
+
+        num_items = self._num_items
+
+        if num_items == 0:
+            return
+
+        item_length = self._item_length
+
+        if item_length is not None:
+            # Every item's offset is known up front, so items are only
+            # created (and laid out) when they're accessed
+            for index, accessor in list(self._accessor_items.items()):
+                accessor._offset = offset + index * item_length
+
+            return
 
         current_offset = offset
 
-        for i in range(self._num_items):
+        for i in range(num_items):
             accessor = self._get_accessor_item(i)
             accessor._offset = current_offset
 
             current_offset += accessor._length
 
+        self.__variable_length = current_offset - offset
+
+    def _clone(self, parent, data_bits, delta):
+        clone = object.__new__(BreadArray)
+        clone.__dict__.update(self.__dict__)
+
+        clone._parent = parent
+        clone._data_bits = data_bits
+
+        if self.__offset is not None:
+            clone.__offset = self.__offset - delta
+
+        if self.__item_length in (None, _VARIABLE_LENGTH):
+            # Items have been laid out one after another, so they're copied
+            clone._accessor_items = dict(
+                (index, item._clone(parent, data_bits, delta))
+                for index, item in self._accessor_items.items())
+        else:
+            # Items are laid out when they're accessed
+            clone._accessor_items = {}
+
+        return clone
 
     def _create_accessor_item(self, index):
         if type(self._item_spec) == list:
@@ -54,10 +149,21 @@ class BreadArray(object):
         return item
 
     def _get_accessor_item(self, index):
-        if self._accessor_items[index] is None:
-            self._accessor_items[index] = self._create_accessor_item(index)
+        item = self._accessor_items.get(index)
+
+        if item is None:
+            item = self._create_accessor_item(index)
+
+            if self._data_bits is not None:
+                item._set_data(self._data_bits)
+
+            if (self.__offset is not None and
+                    self.__item_length not in (None, _VARIABLE_LENGTH)):
+                item._offset = self.__offset + index * self.__item_length
 
-        return self._accessor_items[index]
+            self._accessor_items[index] = item
+
+        return item
 
     def __str__(self):
         string_repr = '['
@@ -81,7 +187,24 @@ class BreadArray(object):
 
     @property
     def _length(self):
-        return self._item_length * self._num_items
+        num_items = self._num_items
+
+        if num_items == 0:
+            return 0
+
+        item_length = self._item_length
+
+        if item_length is None:
+            # Items' lengths are only summed once, rather than every time
+            # the array's length is needed (e.g. by every field after it)
+            if self.__variable_length is None:
+                self.__variable_length = sum(
+                    self._get_accessor_item(i)._length
+                    for i in range(num_items))
+
+            return self.__variable_length
+
+        return item_length * num_items
 
     def __getitem__(self, index):
         if type(index) is slice:
@@ -104,6 +227,35 @@ class BreadArray(object):
     def __len__(self):
         return self._num_items
 
+    def _raw_bytes(self):
+        if self._num_items == 0:
+            return b''
+
+        # Items may not all be the same length (e.g. if they're
+        # conditionals), so the array ends where its last item does
+        last_item = self._get_accessor_item(self._num_items - 1)
+        length = last_item._offset + last_item._length - self._offset
+
+        return _raw_bytes(self._data_bits, self._offset, length)
+
+    def _bytes_identify_values(self):
+        """Return True if items whose bits differ always have different
+        values, so that items can be compared by their bits"""
+        if self._num_items == 0:
+            return True
+
+        type_info = getattr(self._get_accessor_item(0), '_type_info', None)
+
+        if type_info is None or type_info.get('kind') != 'enum':
+            return True
+
+        # Enums with a default or with alternative encodings of a value
+        # decode different bits to the same value
+        values = type_info['values']
+
+        return (type_info['default'] is None and
+                len(set(values.values())) == len(values))
+
     def __eq__(self, other):
         if isinstance(other, list):
             return [self[i] for i in range(self._num_items)] == other
@@ -114,6 +266,13 @@ class BreadArray(object):
         if self._num_items != other._num_items:
             return False
 
+        if (self._item_spec is other._item_spec and
+                self._field_options == other._field_options and
+                self._bytes_identify_values()):
+            # Items with the same spec and options are equal if their bits
+            # are equal
+            return self._raw_bytes() == other._raw_bytes()
+
         for i in range(self._num_items):
             if self[i] != other[i]:
                 return False
@@ -139,23 +298,35 @@ class BreadArray(object):
         for i, item in enumerate(value):
             self._get_accessor_item(i).set(item)
 
-    def as_native(self):
+    def as_native(self, memo=None):
         native_items = []
 
         for i in range(self._num_items):
-            native_items.append(self._get_accessor_item(i).as_native())
+            native_items.append(self._get_accessor_item(i).as_native(memo))
 
         return native_items
 
+    def as_numpy(self):
+        """Decode the whole array into a NumPy array at once; see
+        `array_to_numpy`"""
+        # Imported here because columns depends on this module
+        from .columns import array_to_numpy
+
+        return array_to_numpy(self)
+
     def _set_data(self, data_bits):
         self._data_bits = data_bits
+        self.__variable_length = None
 
-        for i in range(self._num_items):
-            accessor = self._get_accessor_item(i)
+        # Items that haven't been created yet get the data when they are
+        for accessor in self._accessor_items.values():
             accessor._set_data(data_bits)
 
 
 def array(length, substruct):
+    """An array of `length` items, each described by `substruct`. `length`
+    is either a number or the name of an earlier field in the same struct
+    that holds the number of items."""
     def make_array_field(parent, **field_options):
         return BreadArray(length, parent, substruct, field_options)
 
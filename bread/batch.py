@@ -0,0 +1,132 @@
+from bitstring import BitArray
+
+
+def _merge_ranges(ranges):
+    merged = []
+
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+class TrackedBits(object):
+    """Wraps a struct's data to buffer the writes made during a batch and to
+    record which bytes of the data have been changed since they were last
+    written out.
+
+    Created by `BreadStruct.batch`; otherwise behaves like the data it wraps.
+    """
+
+    def __init__(self, data_bits):
+        self._data_bits = data_bits
+
+        # Buffered writes, keyed by bit offset
+        self._pending = {}
+        self._batch_depth = 0
+        self._dirty_ranges = []
+
+    def __len__(self):
+        return len(self._data_bits)
+
+    def __getattr__(self, attr):
+        return getattr(self._data_bits, attr)
+
+    def __eq__(self, other):
+        self.flush()
+
+        if isinstance(other, TrackedBits):
+            other.flush()
+            other = other._data_bits
+
+        return self._data_bits == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def _overlaps_pending(self, start, end):
+        for pos, bits in self._pending.items():
+            if pos < end and start < pos + len(bits):
+                return True
+
+        return False
+
+    def __getitem__(self, key):
+        if self._pending:
+            start, stop, _ = key.indices(len(self))
+
+            # Reads see the writes that preceded them
+            if self._overlaps_pending(start, stop):
+                self.flush()
+
+        return self._data_bits[key]
+
+    def overwrite(self, bits, pos):
+        if self._batch_depth == 0:
+            self._apply(bits, pos)
+            return
+
+        existing = self._pending.get(pos)
+
+        if ((existing is None or len(existing) != len(bits)) and
+                self._overlaps_pending(pos, pos + len(bits))):
+            # Keep overlapping writes in the order they were made
+            self.flush()
+
+        self._pending[pos] = bits
+
+    def _apply(self, bits, pos):
+        self._data_bits.overwrite(bits, pos)
+        self._dirty_ranges.append((pos // 8, (pos + len(bits) + 7) // 8))
+
+    def flush(self):
+        """Apply buffered writes, combining writes to adjacent bits"""
+        region_start = None
+        region = None
+
+        for pos in sorted(self._pending.keys()):
+            bits = self._pending[pos]
+
+            if region is not None and pos == region_start + len(region):
+                region.append(bits)
+            else:
+                if region is not None:
+                    self._apply(region, region_start)
+
+                region_start = pos
+                region = BitArray(bits)
+
+        if region is not None:
+            self._apply(region, region_start)
+
+        self._pending = {}
+
+    def dirty_ranges(self):
+        """Return the (start, end) byte ranges that have been changed,
+        merged and sorted"""
+        self._dirty_ranges = _merge_ranges(self._dirty_ranges)
+        return list(self._dirty_ranges)
+
+    def clear_dirty_ranges(self):
+        self._dirty_ranges = []
+
+    def byte_view(self, start, stop):
+        self.flush()
+
+        byte_view = getattr(self._data_bits, 'byte_view', None)
+
+        if byte_view is None:
+            return None
+
+        return byte_view(start, stop)
+
+    def tobytes(self):
+        self.flush()
+        return self._data_bits.tobytes()
+
+    def tofile(self, fp):
+        self.flush()
+        return self._data_bits.tofile(fp)
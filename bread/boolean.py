@@ -1,8 +1,10 @@
-from bitstring import BitArray
 from .field import BreadField
 
 
 def encode_bool(value):
+    # bitstring is only imported once it's needed
+    from bitstring import BitArray
+
     return BitArray(bool=value)
 
 
@@ -10,7 +12,11 @@ def decode_bool(encoded):
     return encoded.bool
 
 
+_BOOL_TYPE_INFO = {'kind': 'bool'}
+
+
 def boolean(parent, **field_options):
     return BreadField(
         1, encode_bool, decode_bool,
-        str_format=field_options.get('str_format', None))
+        str_format=field_options.get('str_format', None),
+        type_info=_BOOL_TYPE_INFO)
@@ -0,0 +1,259 @@
+import collections
+import mmap
+import os
+import sys
+
+from bitstring import BitArray, Bits
+
+from .utils import _byte_view, _pread, _release_view
+from .vendor import six
+
+
+class BufferBits(object):
+    """Bit-addressed access to a buffer (a memoryview, mmap, shared memory
+    block, etc.) that parsed structs can read from and write to in place.
+
+    Unlike a BitArray, the buffer is never copied as a whole; each slice only
+    copies the bytes that it spans.
+    """
+
+    def __init__(self, buf, shared_memory_name=None):
+        self._view = _byte_view(buf)
+
+        # The name of the shared memory block containing the buffer, if any
+        self.shared_memory_name = shared_memory_name
+
+    def __len__(self):
+        return len(self._view) * 8
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError('BufferBits can only be sliced contiguously')
+
+        start, stop, _ = key.indices(len(self))
+        stop = max(start, stop)
+
+        first_byte = start // 8
+        last_byte = (stop + 7) // 8
+
+        return Bits(bytes=self._view[first_byte:last_byte].tobytes(),
+                    offset=start - first_byte * 8, length=stop - start)
+
+    def byte_view(self, start, stop):
+        """Return a memoryview of the bits from `start` to `stop` without
+        copying them, or None if they don't start and end on byte
+        boundaries."""
+        if start % 8 != 0 or stop % 8 != 0:
+            return None
+
+        return self._view[start // 8:stop // 8]
+
+    @property
+    def read_only(self):
+        return self._view.readonly
+
+    def overwrite(self, bits, pos):
+        if self._view.readonly:
+            raise ValueError("Can't modify data in a read-only buffer")
+
+        end = pos + len(bits)
+
+        if pos % 8 == 0 and end % 8 == 0:
+            self._view[pos // 8:end // 8] = bits.tobytes()
+        else:
+            # Fields that don't start and end on byte boundaries have to
+            # preserve the bits around them in their first and last bytes
+            first_byte = pos // 8
+            last_byte = (end + 7) // 8
+
+            chunk = BitArray(bytes=self._view[first_byte:last_byte].tobytes())
+            chunk.overwrite(bits, pos - first_byte * 8)
+
+            self._view[first_byte:last_byte] = chunk.tobytes()
+
+    def tobytes(self):
+        return self._view.tobytes()
+
+    def tofile(self, fp):
+        fp.write(self._view)
+
+    def release(self):
+        """Release the buffer, e.g. so that the shared memory block or mmap
+        containing it can be closed"""
+        _release_view(self._view)
+
+
+class CopyOnWriteBits(object):
+    """Shares read-only data between the clones of a struct until a clone
+    is changed, when that clone gets its own copy of the data.
+
+    Created by `BreadStruct.clone`; otherwise behaves like the data it wraps.
+    """
+
+    read_only = False
+
+    def __init__(self, data_bits):
+        self._data_bits = data_bits
+        self.copied = False
+
+    def __len__(self):
+        return len(self._data_bits)
+
+    def __getattr__(self, attr):
+        return getattr(self._data_bits, attr)
+
+    def __getitem__(self, key):
+        return self._data_bits[key]
+
+    def overwrite(self, bits, pos):
+        if not self.copied:
+            self._data_bits = BufferBits(bytearray(self._data_bits.tobytes()))
+            self.copied = True
+
+        self._data_bits.overwrite(bits, pos)
+
+
+class WindowedBits(object):
+    """Bit-addressed, read-only access to a file that's too large to read
+    into memory all at once, which can be parsed like any other data.
+
+    The file is read in windows of `window_bytes` bytes as they're needed,
+    and at most `max_windows` windows are kept in memory at once, discarding
+    the least recently used. `source` is a path or a file object opened in
+    binary mode. `faults` counts the windows that have been read.
+    """
+
+    read_only = True
+    shared_memory_name = None
+
+    def __init__(self, source, window_bytes=1 << 20, max_windows=64):
+        if hasattr(source, 'read'):
+            self._file = source
+            self._owns_file = False
+        else:
+            self._file = open(source, 'rb')
+            self._owns_file = True
+
+        self._fd = self._file.fileno()
+        self._size = os.fstat(self._fd).st_size
+
+        self.window_bytes = window_bytes
+        self.max_windows = max_windows
+        self.faults = 0
+
+        # Windows by index, least recently used first
+        self._windows = collections.OrderedDict()
+
+    def __len__(self):
+        return self._size * 8
+
+    def _window(self, index):
+        window = self._windows.pop(index, None)
+
+        if window is None:
+            self.faults += 1
+            window = _pread(
+                self._fd, self.window_bytes, index * self.window_bytes)
+
+            if len(self._windows) >= self.max_windows:
+                self._windows.popitem(last=False)
+
+        self._windows[index] = window
+
+        return window
+
+    def _read_bytes(self, first_byte, last_byte):
+        pieces = []
+
+        while first_byte < last_byte:
+            index, start = divmod(first_byte, self.window_bytes)
+            window = self._window(index)
+            end = min(len(window), start + last_byte - first_byte)
+
+            if end <= start:
+                break
+
+            pieces.append(window[start:end])
+            first_byte += end - start
+
+        return b''.join(pieces)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError('WindowedBits can only be sliced contiguously')
+
+        start, stop, _ = key.indices(len(self))
+        stop = max(start, stop)
+
+        first_byte = start // 8
+        last_byte = (stop + 7) // 8
+
+        return Bits(bytes=self._read_bytes(first_byte, last_byte),
+                    offset=start - first_byte * 8, length=stop - start)
+
+    def byte_view(self, start, stop):
+        """Return a memoryview of the bits from `start` to `stop` if they
+        start and end on byte boundaries within a single window, or None"""
+        if start % 8 != 0 or stop % 8 != 0:
+            return None
+
+        index, window_start = divmod(start // 8, self.window_bytes)
+        window_end = window_start + (stop - start) // 8
+
+        if window_end > self.window_bytes:
+            return None
+
+        return memoryview(self._window(index))[window_start:window_end]
+
+    def overwrite(self, bits, pos):
+        raise ValueError("Can't modify data in a read-only buffer")
+
+    def tobytes(self):
+        return self._read_bytes(0, self._size)
+
+    def tofile(self, fp):
+        for first_byte in range(0, self._size, self.window_bytes):
+            fp.write(self._read_bytes(
+                first_byte, min(first_byte + self.window_bytes, self._size)))
+
+    def release(self):
+        """Discard every window and close the file, if it was opened from a
+        path"""
+        self._windows.clear()
+
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def _data_bits_from_source(data_source, read_only=False):
+    """Convert anything that can be parsed into bits that structs can use as
+    their data"""
+    # Only check for shared memory if the module that provides it has
+    # already been imported by whoever created the shared memory block
+    shared_memory = sys.modules.get('multiprocessing.shared_memory')
+
+    if isinstance(data_source, WindowedBits):
+        data_bits = data_source
+    elif isinstance(data_source, (memoryview, mmap.mmap)):
+        data_bits = BufferBits(data_source)
+    elif (shared_memory is not None and
+          isinstance(data_source, shared_memory.SharedMemory)):
+        data_bits = BufferBits(
+            data_source.buf, shared_memory_name=data_source.name)
+    elif type(data_source) == str:
+        data_bits = BitArray(bytes=six.b(data_source))
+    elif type(data_source) == list:
+        data_bits = BitArray(bytes=data_source)
+    else:
+        data_bits = BitArray(data_source)
+
+    if read_only and not getattr(data_bits, 'read_only', False):
+        data_bits = BufferBits(data_bits.tobytes())
+
+    return data_bits
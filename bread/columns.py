@@ -0,0 +1,262 @@
+from bitstring import Bits
+
+from .enum import _INVALID
+from .layout import LayoutEntry, compile_layout
+from .records import _code_position, _read_source
+from .struct import BreadStruct
+from .utils import _import_optional
+
+
+class Columns(dict):
+    """Maps each leaf field's path to a NumPy array of that field's value in
+    every record.
+
+    Enum columns hold indices into that field's list of values in
+    `categories`, or -1 where a record's value isn't in the enum.
+    """
+
+    def __init__(self):
+        super(Columns, self).__init__()
+        self.categories = {}
+
+
+def _record_data(records_or_source):
+    if (isinstance(records_or_source, (list, tuple)) and
+            all(isinstance(x, BreadStruct) for x in records_or_source)):
+        return b''.join(
+            record._data_bits[
+                record._offset:record._offset + len(record)].tobytes()
+            for record in records_or_source)
+
+    return _read_source(records_or_source)
+
+
+def _raw_codes(numpy, records, entry):
+    first_byte, last_byte, shift, mask = _code_position(entry)
+
+    codes = numpy.zeros(len(records), dtype=numpy.uint64)
+
+    for column in range(first_byte, last_byte):
+        codes <<= numpy.uint64(8)
+        codes |= records[:, column]
+
+    codes >>= numpy.uint64(shift)
+    codes &= numpy.uint64(mask)
+
+    return codes
+
+
+def _int_column(numpy, codes, length, type_info):
+    if type_info['little_endian']:
+        codes = codes.byteswap() >> numpy.uint64(64 - length)
+
+    if not type_info['signed'] and type_info['offset'] == 0:
+        if length == 64:
+            return codes
+
+        return codes.astype(numpy.int64)
+
+    values = codes.astype(numpy.int64)
+
+    if type_info['signed'] and length < 64:
+        values[values >= (1 << (length - 1))] -= (1 << length)
+
+    values += type_info['offset']
+
+    return values
+
+
+def _enum_indices(numpy, values, type_info):
+    """Map the integers that enum fields decoded to into indices into a list
+    of the enum's values (-1 where an integer isn't a valid value), using
+    the enum's table. Returns (indices, list of values)."""
+    categories = []
+    category_indices = {}
+    index_table = numpy.empty(len(type_info['table']), dtype=numpy.int64)
+
+    for code, value in enumerate(type_info['table']):
+        if value is _INVALID:
+            index_table[code] = -1
+            continue
+
+        if value not in category_indices:
+            category_indices[value] = len(categories)
+            categories.append(value)
+
+        index_table[code] = category_indices[value]
+
+    in_table = (values >= 0) & (values < len(index_table))
+    indices = index_table.take(numpy.where(in_table, values, 0))
+
+    # Offsets can move values outside of the table
+    if type_info['default'] is None:
+        indices[~in_table] = -1
+    else:
+        default = type_info['default']
+
+        if default not in category_indices:
+            category_indices[default] = len(categories)
+            categories.append(default)
+
+        indices[~in_table] = category_indices[default]
+
+    return indices, categories
+
+
+def _object_column(numpy, data, num_records, record_bytes, entry):
+    # Fields that can't be decoded in bulk are decoded one record at a time
+    column = numpy.empty(num_records, dtype=object)
+
+    for i in range(num_records):
+        start = i * record_bytes * 8 + entry.offset
+        column[i] = entry.field._decode_fn(Bits(
+            bytes=data[start // 8:(start + entry.length + 7) // 8].tobytes(),
+            offset=start % 8, length=entry.length))
+
+    return column
+
+
+def to_columns(records_or_source, spec):
+    """Decode many records into one NumPy array per leaf field.
+
+    `records_or_source` is either a list of structs parsed with `spec` or a
+    bytes-like object or file object containing back-to-back records, each
+    starting on a byte boundary. Every record must be the same length.
+
+    Integers and booleans are decoded into integer and boolean arrays,
+    strings into fixed-width bytes arrays and enums into indices into a
+    table of the enum's values (see `Columns`). Requires NumPy.
+    """
+    numpy = _import_optional('numpy')
+
+    if numpy is None:
+        raise ImportError('to_columns requires NumPy')
+
+    layout = compile_layout(spec)
+
+    if layout is None:
+        raise ValueError(
+            "Can't convert records to columns unless every record is the "
+            "same length")
+
+    data = _record_data(records_or_source)
+    record_bytes = (layout.length + 7) // 8
+
+    if len(data) % record_bytes != 0:
+        raise ValueError(
+            "Data is %d bytes long, which isn't a whole number of %d-byte "
+            "records" % (len(data), record_bytes))
+
+    num_records = len(data) // record_bytes
+
+    records = numpy.frombuffer(
+        data, dtype=numpy.uint8, count=num_records * record_bytes).reshape(
+            num_records, record_bytes)
+
+    columns = Columns()
+
+    for path, entry in layout.leaves.items():
+        type_info = entry.field._type_info or {}
+        kind = type_info.get('kind')
+        first_byte, last_byte, _, _ = _code_position(entry)
+
+        if kind == 'string' and entry.offset % 8 == 0:
+            columns[path] = numpy.ascontiguousarray(
+                records[:, first_byte:last_byte]).view(
+                    'S%d' % (last_byte - first_byte)).reshape(num_records)
+        elif last_byte - first_byte > 8 or kind not in ('int', 'bool', 'enum'):
+            columns[path] = _object_column(
+                numpy, data, num_records, record_bytes, entry)
+        elif kind == 'bool':
+            columns[path] = _raw_codes(numpy, records, entry).astype(bool)
+        elif kind == 'int':
+            columns[path] = _int_column(
+                numpy, _raw_codes(numpy, records, entry), entry.length,
+                type_info)
+        elif type_info['table'] is not None:
+            columns[path], columns.categories[path] = _enum_indices(
+                numpy, _int_column(
+                    numpy, _raw_codes(numpy, records, entry), entry.length,
+                    type_info), type_info)
+        else:
+            columns[path] = _object_column(
+                numpy, data, num_records, record_bytes, entry)
+
+    return columns
+
+
+def _packed_codes(numpy, data, num_items, item_length):
+    """Return the raw codes of `num_items` back-to-back `item_length`-bit
+    items at the start of `data`"""
+    if item_length % 8 == 0:
+        items = numpy.frombuffer(
+            data, dtype=numpy.uint8, count=num_items * item_length // 8
+        ).reshape(num_items, item_length // 8)
+
+        return _raw_codes(numpy, items, LayoutEntry(0, item_length, None))
+
+    bits = numpy.unpackbits(numpy.frombuffer(data, dtype=numpy.uint8))
+    bits = bits[:num_items * item_length].reshape(num_items, item_length)
+
+    weights = numpy.uint64(1) << numpy.arange(
+        item_length - 1, -1, -1, dtype=numpy.uint64)
+
+    return bits.astype(numpy.uint64).dot(weights)
+
+
+def array_to_numpy(array):
+    """Decode every item of an array of integers, booleans, enums or
+    strings at once into a NumPy array (of raw bytes, for strings). Called
+    by `BreadArray.as_numpy`."""
+    numpy = _import_optional('numpy')
+
+    if numpy is None:
+        raise ImportError('as_numpy requires NumPy')
+
+    if array._num_items == 0:
+        return numpy.empty(0)
+
+    item = array._get_accessor_item(0)
+    type_info = getattr(item, '_type_info', None) or {}
+    kind = type_info.get('kind')
+
+    data = array._data_bits[
+        array._offset:array._offset + array._length].tobytes()
+
+    if kind == 'string':
+        # NumPy strips strings' trailing NULs itself
+        return numpy.frombuffer(
+            data, dtype='S%d' % (item._length // 8), count=array._num_items)
+
+    if kind not in ('int', 'bool', 'enum') or item._length > 64:
+        raise ValueError(
+            "Only arrays of integers, booleans, enums and strings can be "
+            "converted to NumPy arrays")
+    codes = _packed_codes(numpy, data, array._num_items, item._length)
+
+    if kind == 'bool':
+        return codes.astype(bool)
+
+    values = _int_column(numpy, codes, item._length, type_info)
+
+    if kind == 'int':
+        return values
+
+    if type_info['table'] is None:
+        return numpy.array(
+            [item._decode_fn(Bits(uint=int(code), length=item._length))
+             for code in codes], dtype=object)
+
+    indices, categories = _enum_indices(numpy, values, type_info)
+
+    if (indices < 0).any():
+        raise ValueError(
+            '%d is not a valid enum value; valid values %s' % (
+                values[indices < 0][0], type_info['values']))
+
+    category_values = numpy.empty(len(categories), dtype=object)
+
+    for i, category in enumerate(categories):
+        category_values[i] = category
+
+    return category_values.take(indices)
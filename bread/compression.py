@@ -0,0 +1,196 @@
+import itertools
+import zlib
+
+from .utils import _byte_view, _import_optional, _to_bytes
+
+# How much data is read from a source at a time when it's streamed
+_CHUNK_BYTES = 1 << 16
+
+# The magic bytes that each supported compression format's data starts with
+_MAGIC_BYTES = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz')
+]
+
+COMPRESSION_FORMATS = [compression for _, compression in _MAGIC_BYTES]
+
+# How much data is decompressed to check that data that starts with a
+# compression format's magic bytes really is compressed
+_SNIFF_BYTES = 1024
+
+
+def detect_compression(data):
+    """Return the compression format ('gzip', 'bz2' or 'xz') that `data`
+    (the start of a file or buffer) is compressed with, or None"""
+    for magic, compression in _MAGIC_BYTES:
+        if _to_bytes(data[:len(magic)]) == magic:
+            return compression
+
+    return None
+
+
+def _decompression_errors():
+    # The errors that decompressors raise for data they can't decompress
+    errors = (zlib.error, IOError, OSError)
+    lzma = _import_optional('lzma')
+
+    if lzma is not None:
+        errors += (lzma.LZMAError,)
+
+    return errors
+
+
+def _sniff_compression(data):
+    """Return the compression format that `data` (the start of a file or
+    buffer) is compressed with, or None if it isn't compressed.
+
+    Uncompressed data can start with a format's magic bytes (e.g. a record
+    whose first field is 0x1f8b), so data is only considered compressed if
+    its start decompresses."""
+    compression = detect_compression(data)
+
+    if compression is None:
+        return None
+
+    try:
+        # Only the first chunk of output is needed to know that the data
+        # decompresses
+        next(_decompress_bounded(
+            _decompressor(compression), _to_bytes(data[:_SNIFF_BYTES])))
+    except _decompression_errors():
+        return None
+
+    return compression
+
+
+def _decompressor(compression):
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    module = _import_optional({'bz2': 'bz2', 'xz': 'lzma'}[compression])
+
+    if module is None:
+        raise ImportError(
+            "Python wasn't built with support for %s compression" %
+            (compression))
+
+    if compression == 'bz2':
+        return module.BZ2Decompressor()
+    else:
+        return module.LZMADecompressor()
+
+
+def _raw_chunks(source):
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(_CHUNK_BYTES)
+
+            if not chunk:
+                return
+
+            yield chunk
+    else:
+        view = _byte_view(source)
+
+        for start in range(0, len(view), _CHUNK_BYTES):
+            chunk = view[start:start + _CHUNK_BYTES]
+
+            # Python 2's decompressors don't accept memoryviews
+            if not hasattr(chunk, 'cast'):
+                chunk = chunk.tobytes()
+
+            yield chunk
+
+
+def _stream_ended(decompressor):
+    eof = getattr(decompressor, 'eof', None)
+
+    if eof is not None:
+        return eof
+
+    # Python 2's decompressors don't say when their stream has ended, but
+    # keep the data after its end
+    return bool(decompressor.unused_data)
+
+
+def _decompress_bounded(decompressor, data):
+    """Decompress `data`, yielding at most _CHUNK_BYTES of output at a time,
+    so that highly compressed data doesn't expand all at once"""
+    if hasattr(decompressor, 'unconsumed_tail'):
+        # zlib keeps the input that it didn't get to
+        while True:
+            output = decompressor.decompress(data, _CHUNK_BYTES)
+            yield output
+
+            data = decompressor.unconsumed_tail
+
+            if not data and len(output) < _CHUNK_BYTES:
+                return
+    elif hasattr(decompressor, 'needs_input'):
+        # bz2 and lzma keep their input, and say when they have more output
+        yield decompressor.decompress(data, _CHUNK_BYTES)
+
+        while not decompressor.needs_input and not decompressor.eof:
+            yield decompressor.decompress(b'', _CHUNK_BYTES)
+    else:   # pragma: no cover
+        # Python 2's bz2 can't limit its output
+        yield decompressor.decompress(data)
+
+
+def _decompressed_chunks(chunks, compression):
+    decompressor = _decompressor(compression)
+
+    for chunk in chunks:
+        while chunk:
+            for output in _decompress_bounded(decompressor, chunk):
+                yield output
+
+            # Files can contain several compressed streams back-to-back
+            # (e.g. concatenated gzip files), each of which needs a new
+            # decompressor
+            chunk = b''
+
+            if _stream_ended(decompressor):
+                chunk = decompressor.unused_data
+                decompressor = _decompressor(compression)
+
+    if hasattr(decompressor, 'flush'):
+        yield decompressor.flush()
+
+
+def stream_chunks(source, compression='auto'):
+    """Iterate over the data in `source` (a bytes-like object or file object)
+    a chunk at a time, decompressing it as it's read.
+
+    If `compression` is 'auto', the compression format is detected from the
+    data's magic bytes. Otherwise, it's one of 'gzip', 'bz2' and 'xz', or
+    None if the data isn't compressed.
+    """
+    chunks = _raw_chunks(source)
+
+    # Read enough to check that the data decompresses, even from small
+    # chunks
+    first_chunks = []
+    start = b''
+
+    while compression == 'auto' and len(start) < _SNIFF_BYTES:
+        chunk = next(chunks, None)
+
+        if chunk is None:
+            break
+
+        first_chunks.append(chunk)
+        start += _to_bytes(chunk[:_SNIFF_BYTES - len(start)])
+
+    chunks = itertools.chain(first_chunks, chunks)
+
+    if compression == 'auto':
+        compression = _sniff_compression(start)
+    elif compression is not None and compression not in COMPRESSION_FORMATS:
+        raise ValueError("Unknown compression format '%s'" % (compression))
+
+    if compression is None:
+        return chunks
+
+    return _decompressed_chunks(chunks, compression)
@@ -0,0 +1,175 @@
+import collections
+
+from .array import BreadArray
+from .buffer import BufferBits, _data_bits_from_source
+from .layout import static_length
+from .struct import BreadConditional, BreadStruct, build_struct
+from .utils import _SpecCache
+
+# Generated record types, keyed by type name and field names
+_record_types = {}
+
+# Plans for decoding specs whose layouts don't depend on the data, keyed by
+# the spec's contents and type name. Specs that depend on the data have a
+# plan of None.
+_decode_plans = _SpecCache()
+
+# The kinds of steps in a decoding plan
+_LEAF = 0
+_STRUCT = 1
+_ARRAY = 2
+
+
+def _record_type(type_name, field_names):
+    key = (type_name, field_names)
+
+    if key not in _record_types:
+        # Field names that can't be namedtuple fields (e.g. keywords, or
+        # names repeated in different conditions) are renamed
+        _record_types[key] = collections.namedtuple(
+            type_name, field_names, rename=True)
+
+    return _record_types[key]
+
+
+def _plan(field, start):
+    # Offsets in a plan are relative to `start`, the start of the record or
+    # array item that the plan decodes
+    if isinstance(field, BreadStruct):
+        names = []
+        plans = []
+
+        for subfield in field._field_list:
+            if subfield._name[0] != '_':
+                names.append(subfield._name)
+                plans.append(_plan(subfield, start))
+
+        return (_STRUCT, _record_type(type(field).__name__, tuple(names)),
+                plans)
+    elif isinstance(field, BreadArray):
+        num_items = field._num_items
+        item_plan = None
+
+        # Every item has the same layout, so one item's plan decodes them all
+        if num_items > 0:
+            item = field._get_accessor_item(0)
+            item_plan = _plan(item, item._offset)
+
+        return (_ARRAY, field._offset - start, field._item_length, num_items,
+                item_plan)
+    else:
+        return (_LEAF, field._offset - start, field._length, field._decode_fn,
+                field._decode_bytes_fn)
+
+
+def _compile_plan(spec, type_name):
+    struct = build_struct(spec, type_name)
+    length = static_length(struct)
+
+    if length is None:
+        return None
+
+    struct._offset = 0
+
+    return (length, _plan(struct, 0))
+
+
+def _decode_plan(spec, type_name):
+    return _decode_plans.get(
+        spec, type_name, lambda: _compile_plan(spec, type_name))
+
+
+def _decode(plan, data_bits, byte_view, start):
+    kind = plan[0]
+
+    if kind == _LEAF:
+        _, offset, length, decode_fn, decode_bytes_fn = plan
+        begin = start + offset
+
+        if decode_bytes_fn is not None and byte_view is not None:
+            view = byte_view(begin, begin + length)
+
+            if view is not None:
+                return decode_bytes_fn(view)
+
+        return decode_fn(data_bits[begin:begin + length])
+    elif kind == _STRUCT:
+        return plan[1](*[_decode(field_plan, data_bits, byte_view, start)
+                         for field_plan in plan[2]])
+    else:
+        _, offset, item_length, num_items, item_plan = plan
+        begin = start + offset
+
+        return [_decode(item_plan, data_bits, byte_view,
+                        begin + i * item_length)
+                for i in range(num_items)]
+
+
+def _parse_eagerly(data_source, spec, type_name):
+    """Decode `data_source` straight into namedtuples, without creating the
+    struct's fields, if `spec`'s layout doesn't depend on the data. Returns
+    None if it does."""
+    plan = _decode_plan(spec, type_name)
+
+    if plan is None:
+        return None
+
+    length, record_plan = plan
+
+    # bytes are read in place, so that fields can be decoded straight from
+    # the buffer
+    in_place = type(data_source) in (bytes, bytearray)
+
+    if in_place:
+        data_bits = BufferBits(data_source)
+    else:
+        data_bits = _data_bits_from_source(data_source)
+
+    try:
+        if length > len(data_bits):
+            raise ValueError(
+                ("Data being parsed isn't long enough; expected at least %d "
+                 "bits, but data is only %d bits long") %
+                (length, len(data_bits)))
+
+        return _decode(record_plan, data_bits,
+                       getattr(data_bits, 'byte_view', None), 0)
+    finally:
+        if in_place:
+            # Don't leave a bytearray's buffer exported, so that it can
+            # still be resized
+            data_bits.release()
+
+
+def _collect_fields(struct, names, values):
+    for field in struct._field_list:
+        if isinstance(field, BreadConditional):
+            # Fields in a conditional appear to belong to the enclosing struct
+            _collect_fields(
+                field._conditions[field._get_condition()], names, values)
+        elif field._name[0] != '_':
+            names.append(field._name)
+            values.append(decode_eagerly(field))
+
+
+def decode_eagerly(field):
+    """Decode every value in a parsed struct, array or field at once.
+
+    Structs become namedtuples (one type per struct type name and set of
+    fields), arrays become lists and leaf fields become their values. The
+    result doesn't refer back to the parsed object or its data.
+    """
+    if isinstance(field, BreadConditional):
+        return decode_eagerly(field._conditions[field._get_condition()])
+    elif isinstance(field, BreadStruct):
+        names = []
+        values = []
+
+        _collect_fields(field, names, values)
+
+        return _record_type(type(field).__name__, tuple(names))(*values)
+    elif isinstance(field, BreadArray):
+        return [decode_eagerly(field._get_accessor_item(i))
+                for i in range(field._num_items)]
+    else:
+        return field.get()
@@ -17,34 +17,74 @@ def _validate_key_types(enum_values):
                              "be ints, int tuples, or int lists (%s)" % (enum_values))
 
 
-def enum(length, values, default=None):
-    def make_enum_field(parent, **field_options):
-        enum_field = intX(length, signed=False)(parent, **field_options)
+# Enums up to this many bits long decode values with a table covering every
+# possible value of the field
+_MAX_TABLE_BITS = 16
 
-        old_encode_fn = enum_field._encode_fn
-        old_decode_fn = enum_field._decode_fn
+# Marks the entries of an enum's table that aren't valid values
+_INVALID = object()
 
-        keys = {}
-        flattened_values = {}
 
-        _validate_key_types(values)
+def _flatten_values(values):
+    keys = {}
+    flattened_values = {}
 
-        for k, v in values.items():
-            if type(k) in (tuple, list):
-                for alternative in k:
-                    if type(alternative) is not int:
-                        raise ValueError("Keys in an enum's values dict "
-                                         "should be ints, tuples, or lists (%s)" % (values))
+    _validate_key_types(values)
 
-                    flattened_values[alternative] = v
+    for k, v in values.items():
+        if type(k) in (tuple, list):
+            for alternative in k:
+                if type(alternative) is not int:
+                    raise ValueError("Keys in an enum's values dict "
+                                     "should be ints, tuples, or lists (%s)" % (values))
 
-                # If presented with a list of options for an enum's integer representation, always pick the first one
-                keys[v] = k[0]
-            elif type(k) == int:
-                keys[v] = k
-                flattened_values[k] = v
-            else:
-                raise ValueError("Keys in an enum's values dict should be ints, tuples, or lists (%s)" % (values))
+                flattened_values[alternative] = v
+
+            # If presented with a list of options for an enum's integer representation, always pick the first one
+            keys[v] = k[0]
+        elif type(k) == int:
+            keys[v] = k
+            flattened_values[k] = v
+        else:
+            raise ValueError("Keys in an enum's values dict should be ints, tuples, or lists (%s)" % (values))
+
+    return keys, flattened_values
+
+
+def _value_table(length, flattened_values, default):
+    """Return a list mapping every integer that a `length`-bit field can hold
+    to its enum value, or None if the field is too long for a table"""
+    if length > _MAX_TABLE_BITS:
+        return None
+
+    if default is None:
+        missing = _INVALID
+    else:
+        missing = default
+
+    table = [missing] * (1 << length)
+
+    for k, v in flattened_values.items():
+        if 0 <= k < len(table):
+            table[k] = v
+
+    return table
+
+
+def enum(length, values, default=None):
+    # The enum's values are looked up the same way by every field, so they're
+    # only computed once
+    keys, flattened_values = _flatten_values(values)
+    table = _value_table(length, flattened_values, default)
+
+    # Enum fields are integer fields with their values translated, and share
+    # their encode and decode functions in the same way
+    make_int_field = intX(length, signed=False)
+    codec_cache = {}
+
+    def make_codec(int_field):
+        old_encode_fn = int_field._encode_fn
+        old_decode_fn = int_field._decode_fn
 
         def encode_enum(key):
             if key not in keys:
@@ -52,20 +92,50 @@ def enum(length, values, default=None):
 
             return old_encode_fn(keys[key])
 
+        def invalid_value(decoded_value):
+            if default is not None:
+                return default
+            else:
+                raise ValueError(
+                    '%d is not a valid enum value; valid values %s' % (decoded_value, flattened_values))
+
         def decode_enum(encoded):
             decoded_value = old_decode_fn(encoded)
 
+            if table is not None and 0 <= decoded_value < len(table):
+                value = table[decoded_value]
+
+                if value is _INVALID:
+                    return invalid_value(decoded_value)
+
+                return value
+
             if decoded_value not in flattened_values:
-                if default is not None:
-                    return default
-                else:
-                    raise ValueError(
-                        '%d is not a valid enum value; valid values %s' % (decoded_value, flattened_values))
+                return invalid_value(decoded_value)
 
             return flattened_values[decoded_value]
 
-        enum_field._encode_fn = encode_enum
-        enum_field._decode_fn = decode_enum
+        # Enums decode their values from integers that are encoded like any
+        # other integer field's
+        type_info = dict(int_field._type_info)
+        type_info.update({
+            'kind': 'enum',
+            'values': flattened_values,
+            'default': default,
+            'table': table
+        })
+
+        return encode_enum, decode_enum, type_info
+
+    def make_enum_field(parent, **field_options):
+        enum_field = make_int_field(parent, **field_options)
+
+        # Integer fields with the same options share a decode function
+        if enum_field._decode_fn not in codec_cache:
+            codec_cache[enum_field._decode_fn] = make_codec(enum_field)
+
+        (enum_field._encode_fn, enum_field._decode_fn,
+         enum_field._type_info) = codec_cache[enum_field._decode_fn]
 
         return enum_field
 
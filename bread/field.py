@@ -1,5 +1,15 @@
 class BreadField(object):
-    def __init__(self, length, encode_fn, decode_fn, str_format):
+    # Structs can have many thousands of leaf fields, so fields don't have a
+    # __dict__
+    __slots__ = ('_data_bits', '__offset', '_length', '_cached_value',
+                 '_encode_fn', '_decode_fn', '_str_format', '_type_info',
+                 '_decode_bytes_fn', '_name')
+
+    # Whether the field's length is independent of the data being parsed
+    _fixed_length = True
+
+    def __init__(self, length, encode_fn, decode_fn, str_format,
+                 type_info=None, decode_bytes_fn=None):
         self._data_bits = None
         self.__offset = None
         self._length = length
@@ -10,6 +20,15 @@ class BreadField(object):
 
         self._str_format = str_format
 
+        # Describes how the field encodes values (e.g. {'kind': 'int',
+        # 'signed': True, ...}) for code that decodes many values at once
+        self._type_info = type_info
+
+        # Decodes the field from a bytes-like object instead of bits, if
+        # the field can be, so that fields that start and end on byte
+        # boundaries can be decoded straight from the data's buffer
+        self._decode_bytes_fn = decode_bytes_fn
+
         self._name = None
 
     @property
@@ -23,6 +42,30 @@ class BreadField(object):
 
     def _set_data(self, data_bits):
         self._data_bits = data_bits
+        self._cached_value = None
+
+    def _clone(self, parent, data_bits, delta):
+        # A copy of the field that reads `data_bits`, where its offset is
+        # `delta` bits earlier. The data is the same, so the cached value is
+        # still valid.
+        clone = object.__new__(type(self))
+        clone._data_bits = data_bits
+
+        if self.__offset is None:
+            clone.__offset = None
+        else:
+            clone.__offset = self.__offset - delta
+
+        clone._length = self._length
+        clone._cached_value = self._cached_value
+        clone._encode_fn = self._encode_fn
+        clone._decode_fn = self._decode_fn
+        clone._str_format = self._str_format
+        clone._type_info = self._type_info
+        clone._decode_bytes_fn = self._decode_bytes_fn
+        clone._name = self._name
+
+        return clone
 
     def __eq__(self, other):
         if not isinstance(other, BreadField):
@@ -34,7 +77,12 @@ class BreadField(object):
         return not self.__eq__(other)
 
     def get(self):
-        if self._cached_value is None:
+        # The cached value is only read once so that threads sharing a
+        # read-only struct can fill in its cache concurrently; at worst they
+        # both decode the same value.
+        value = self._cached_value
+
+        if value is None:
             if self._offset is None:
                 raise AttributeError(
                     "Haven't initialized the field '%s' with offsets yet" %
@@ -43,12 +91,24 @@ class BreadField(object):
             start_bit = self._offset
             end_bit = self._offset + self._length
 
-            value_bits = self._data_bits[start_bit:end_bit]
-            self._cached_value = self._decode_fn(value_bits)
+            view = None
+
+            if self._decode_bytes_fn is not None:
+                byte_view = getattr(self._data_bits, 'byte_view', None)
+
+                if byte_view is not None:
+                    view = byte_view(start_bit, end_bit)
+
+            if view is not None:
+                value = self._decode_bytes_fn(view)
+            else:
+                value = self._decode_fn(self._data_bits[start_bit:end_bit])
+
+            self._cached_value = value
 
-        return self._cached_value
+        return value
 
-    def as_native(self):
+    def as_native(self, memo=None):
         return self.get()
 
     def __str__(self):
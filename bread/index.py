@@ -0,0 +1,276 @@
+from __future__ import absolute_import
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+
+from bitstring import Bits
+
+from .layout import compile_layout, resolve_field
+from .lifecycle import parse
+from .records import _record_spans
+from .utils import _byte_view
+
+_INDEX_MAGIC = b'BREADIDX'
+_INDEX_VERSION = 1
+
+# magic, version, number of records, width in bytes of each key (0 if the
+# index isn't keyed), length of the key field's path. The header is followed
+# by the key field's path (padded to a multiple of 8 bytes), the offset of
+# every record plus the offset of the end of the last record, and, if the
+# index is keyed, the sorted keys (also padded) and their record numbers.
+_INDEX_HEADER = struct.Struct('<8sQQQQ')
+
+
+def _map_file(path):
+    """Map a file into memory read-only, returning (file, mapping, view)"""
+    fp = open(path, 'rb')
+
+    if os.fstat(fp.fileno()).st_size == 0:
+        return fp, None, memoryview(b'')
+
+    mapping = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return fp, mapping, _byte_view(mapping)
+
+
+def _uint64_bytes(values):
+    # array('Q') isn't available on Python 2
+    return struct.pack('<%dQ' % (len(values)), *values)
+
+
+def _uint64_view(view):
+    # memoryview.cast isn't available before Python 3.3
+    if sys.byteorder == 'little' and hasattr(view, 'cast'):
+        return view.cast('Q')
+    else:   # pragma: no cover
+        return struct.unpack('<%dQ' % (len(view) // 8), view.tobytes())
+
+
+def _key_bytes(field, value):
+    return field._encode_fn(value).tobytes()
+
+
+class _KeyList(object):
+    """A sequence view of fixed-width keys stored back-to-back in a buffer,
+    so that the keys can be searched with bisect"""
+
+    def __init__(self, view, key_width, num_keys):
+        self._view = view
+        self._key_width = key_width
+        self._num_keys = num_keys
+
+    def __len__(self):
+        return self._num_keys
+
+    def __getitem__(self, index):
+        start = index * self._key_width
+        return self._view[start:start + self._key_width].tobytes()
+
+
+class RecordIndex(object):
+    """Random access to the records in a file by record number or key.
+
+    Created by `build_index` or `load_index`. Both the index and the data file
+    are memory-mapped, so only the records that are accessed are read.
+    """
+
+    def __init__(self, path, spec, index_path, type_name='bread_struct'):
+        self._spec = spec
+        self._type_name = type_name
+
+        self._data_file, self._data_map, self._data = _map_file(path)
+        self._index_file, self._index_map, index_view = _map_file(
+            index_path)
+
+        magic, version, num_records, key_width, key_path_length = (
+            _INDEX_HEADER.unpack(index_view[:_INDEX_HEADER.size].tobytes()))
+
+        if magic != _INDEX_MAGIC or version != _INDEX_VERSION:
+            raise ValueError("'%s' isn't a bread index" % (index_path))
+
+        self._num_records = num_records
+        self._key_width = key_width
+        self._key_field = None
+        self._keys = None
+        self._key_records = None
+
+        position = _INDEX_HEADER.size
+
+        self.key = index_view[position:position + key_path_length].tobytes(
+        ).decode('utf-8') or None
+        position += key_path_length + (-key_path_length % 8)
+        offsets_length = (num_records + 1) * 8
+
+        self._offsets = _uint64_view(
+            index_view[position:position + offsets_length])
+        position += offsets_length
+
+        if key_width > 0:
+            keys_length = num_records * key_width
+            self._keys = _KeyList(
+                index_view[position:position + keys_length], key_width,
+                num_records)
+            position += keys_length + (-keys_length % 8)
+
+            self._key_records = _uint64_view(
+                index_view[position:position + num_records * 8])
+
+    def __len__(self):
+        return self._num_records
+
+    def offset(self, n):
+        """Return the byte offset of record `n` in the data file"""
+        if n < 0 or n >= self._num_records:
+            raise IndexError('record index out of range')
+
+        return self._offsets[n]
+
+    def get(self, n):
+        """Parse and return record `n`"""
+        start = self.offset(n)
+        end = self._offsets[n + 1]
+
+        return parse(self._data[start:end].tobytes(), self._spec,
+                     type_name=self._type_name)
+
+    def lookup(self, key):
+        """Parse and return the first record whose key field is `key`"""
+        if self._key_width == 0:
+            raise ValueError("Index wasn't built with a key field")
+
+        if self._key_field is None:
+            # Every record's key field encodes keys the same way, so any
+            # record's key field will do
+            self._key_field = resolve_field(self.get(0), self.key)
+
+        try:
+            key_bytes = _key_bytes(self._key_field, key)
+        except ValueError:
+            raise KeyError(key)
+
+        position = bisect.bisect_left(self._keys, key_bytes)
+
+        if position == len(self._keys) or self._keys[position] != key_bytes:
+            raise KeyError(key)
+
+        return self.get(self._key_records[position])
+
+    def close(self):
+        # Views into the mappings have to be released before the mappings
+        # themselves can be closed
+        self._data = self._offsets = self._keys = self._key_records = None
+
+        for mapping in (self._data_map, self._index_map):
+            if mapping is not None:
+                mapping.close()
+
+        self._data_file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _record_keys(data, spec, spans, key):
+    layout = compile_layout(spec)
+
+    if layout is not None:
+        if key not in layout.leaves:
+            raise ValueError("No known field '%s'" % (key))
+
+        entry = layout.leaves[key]
+        field = entry.field
+
+        for offset, _ in spans:
+            start = offset * 8 + entry.offset
+            bits = Bits(bytes=data[start // 8:(start + entry.length + 7) // 8]
+                        .tobytes(), offset=start % 8, length=entry.length)
+
+            # Keys are stored in their canonical encoding, so that values
+            # that have several encodings (like enums) can be looked up
+            yield _key_bytes(field, field._decode_fn(bits))
+    else:
+        for offset, length in spans:
+            record = parse(data[offset:offset + length].tobytes(), spec)
+            field = resolve_field(record, key)
+
+            yield _key_bytes(field, field.get())
+
+
+def _index_path(path, index_path):
+    if index_path is None:
+        return path + '.idx'
+
+    return index_path
+
+
+def build_index(path, spec, key=None, index_path=None,
+                type_name='bread_struct'):
+    """Index the records in the file at `path` for random access.
+
+    The index is written to `index_path` (by default, `path` with '.idx'
+    appended) and contains the byte offset of every record and, if `key` is
+    the path of a field, a sorted table of every record's value for that
+    field. Returns a `RecordIndex` for the file.
+    """
+    index_path = _index_path(path, index_path)
+
+    data_file, data_map, data = _map_file(path)
+
+    try:
+        spans = list(_record_spans(data, spec, {}))
+
+        offsets = [offset for offset, _ in spans]
+        offsets.append(len(data))
+
+        key_width = 0
+
+        if key is not None:
+            keys = list(_record_keys(data, spec, spans, key))
+
+            if len(keys) > 0:
+                key_width = len(keys[0])
+
+            # Keys are stored in a table of fixed-width entries
+            if any(len(key_bytes) != key_width for key_bytes in keys):
+                raise ValueError(
+                    "Can't index by field '%s', since its values aren't all "
+                    "encoded with the same number of bytes" % (key))
+
+            sorted_keys = sorted(range(len(keys)), key=lambda i: keys[i])
+    finally:
+        del data
+
+        if data_map is not None:
+            data_map.close()
+
+        data_file.close()
+
+    key_path = (key or '').encode('utf-8')
+
+    with open(index_path, 'wb') as fp:
+        fp.write(_INDEX_HEADER.pack(
+            _INDEX_MAGIC, _INDEX_VERSION, len(spans), key_width,
+            len(key_path)))
+        fp.write(key_path + b'\0' * (-len(key_path) % 8))
+        fp.write(_uint64_bytes(offsets))
+
+        if key_width > 0:
+            keys_data = b''.join(keys[i] for i in sorted_keys)
+            fp.write(keys_data)
+            fp.write(b'\0' * (-len(keys_data) % 8))
+            fp.write(_uint64_bytes(sorted_keys))
+
+    return load_index(path, spec, index_path, type_name=type_name)
+
+
+def load_index(path, spec, index_path=None, type_name='bread_struct'):
+    """Load an index created by `build_index` for the file at `path`"""
+    return RecordIndex(path, spec, _index_path(path, index_path),
+                       type_name=type_name)
@@ -1,57 +1,85 @@
-from bitstring import BitArray
-
 from .constants import BIG_ENDIAN
 from .field import BreadField
 
 
-def intX(length, signed=False):
-    def make_intX_field(parent, **field_options):
-        if length % 8 == 0 and length >= 8:
-            int_type_key = None
+def _intX_codec(length, signed, big_endian, offset):
+    """Return the encode function, decode function and type info shared by
+    every field of an integer type with the given options"""
+    little_endian = False
+
+    if length % 8 == 0 and length >= 8:
+        int_type_key = None
+
+        if signed:
+            int_type_key = 'int'
+        else:
+            int_type_key = 'uint'
+
+        if big_endian:
+            int_type_key += 'be'
+        else:
+            int_type_key += 'le'
+            little_endian = True
+
+        def encode_intX(value):
+            # bitstring is only imported once it's needed
+            from bitstring import BitArray
+
+            options = {}
+            options[int_type_key] = value - offset
+            options['length'] = length
+
+            return BitArray(**options)
+
+        def decode_intX(encoded):
+            return getattr(encoded, int_type_key) + offset
+    else:
+        def encode_intX(value):
+            from bitstring import BitArray
+
+            value -= offset
 
             if signed:
-                int_type_key = 'int'
+                return BitArray(int=value, length=length)
             else:
-                int_type_key = 'uint'
+                return BitArray(uint=value, length=length)
 
-            if field_options.get('endianness', None) == BIG_ENDIAN:
-                int_type_key += 'be'
+        def decode_intX(encoded):
+            if signed:
+                decoded = encoded.int
             else:
-                int_type_key += 'le'
+                decoded = encoded.uint
 
-            offset = field_options.get('offset', 0)
+            return decoded + offset
 
-            def encode_intX(value):
-                options = {}
-                options[int_type_key] = value - offset
-                options['length'] = length
+    type_info = {
+        'kind': 'int',
+        'signed': signed,
+        'little_endian': little_endian,
+        'offset': offset
+    }
 
-                return BitArray(**options)
+    return encode_intX, decode_intX, type_info
 
-            def decode_intX(encoded):
-                return getattr(encoded, int_type_key) + offset
-        else:
-            offset = field_options.get('offset', 0)
 
-            def encode_intX(value):
-                value -= offset
+def intX(length, signed=False):
+    # Codecs by (big endian, offset), so that fields with the same options
+    # don't each create their own
+    codec_cache = {}
 
-                if signed:
-                    return BitArray(int=value, length=length)
-                else:
-                    return BitArray(uint=value, length=length)
+    def make_intX_field(parent, **field_options):
+        codec_key = (field_options.get('endianness', None) == BIG_ENDIAN,
+                     field_options.get('offset', 0))
 
-            def decode_intX(encoded):
-                if signed:
-                    decoded = encoded.int
-                else:
-                    decoded = encoded.uint
+        if codec_key not in codec_cache:
+            codec_cache[codec_key] = _intX_codec(length, signed, *codec_key)
 
-                return decoded + offset
+        encode_intX, decode_intX, type_info = codec_cache[codec_key]
 
         return BreadField(
             length, encode_intX, decode_intX,
-            str_format=field_options.get('str_format', None))
+            str_format=field_options.get('str_format', None),
+            type_info=type_info)
 
     return make_intX_field
 
@@ -0,0 +1,187 @@
+import collections
+import re
+
+from .array import BreadArray
+from .constants import CONDITIONAL
+from .struct import BreadConditional, BreadStruct, build_struct
+from .utils import _SpecCache
+
+
+_PATH_COMPONENT = re.compile(r'^([^\[\]]+)((?:\[(?:\*|\d+)\])*)$')
+_PATH_INDEX = re.compile(r'\[(\*|\d+)\]')
+
+
+def parse_path(path):
+    """Split a field path like 'items[*].volume' into its components.
+
+    Field names are returned as strings, array indices as ints and array
+    wildcards as '*'.
+    """
+    components = []
+
+    for part in path.split('.'):
+        match = _PATH_COMPONENT.match(part)
+
+        if match is None:
+            raise ValueError("Malformed field path '%s'" % (path))
+
+        components.append(match.group(1))
+
+        for index in _PATH_INDEX.findall(match.group(2)):
+            if index == '*':
+                components.append(index)
+            else:
+                components.append(int(index))
+
+    return components
+
+
+def static_length(field):
+    """Return the length of a field in bits if it doesn't depend on the data
+    being parsed, or None if it does (e.g. the field contains a
+    conditional)."""
+    if isinstance(field, BreadConditional):
+        return None
+    elif isinstance(field, BreadStruct):
+        total_length = 0
+
+        for subfield in field._field_list:
+            length = static_length(subfield)
+
+            if length is None:
+                return None
+
+            total_length += length
+
+        return total_length
+    elif isinstance(field, BreadArray):
+        if field._length_field_name is not None:
+            return None
+
+        if field._num_items == 0:
+            return 0
+
+        if (type(field._item_spec) == tuple and
+                field._item_spec[0] == CONDITIONAL):
+            return None
+
+        item_length = static_length(field._get_accessor_item(0))
+
+        if item_length is None:
+            return None
+
+        return item_length * field._num_items
+    elif not field._fixed_length:
+        return None
+    else:
+        return field._length
+
+
+# A leaf field's position within a record, along with an accessor for that
+# leaf that can be used to encode and decode its values
+LayoutEntry = collections.namedtuple(
+    'LayoutEntry', ['offset', 'length', 'field'])
+
+# The static layout of a spec: its length in bits and an ordered mapping
+# from each named leaf field's path to its LayoutEntry
+Layout = collections.namedtuple('Layout', ['length', 'leaves'])
+
+# Layouts are cached by the contents of their spec
+_layout_cache = _SpecCache()
+
+
+def _add_leaves(field, path, leaves):
+    if isinstance(field, BreadStruct):
+        for subfield in field._field_list:
+            if subfield._name is None or subfield._name[0] == '_':
+                continue
+
+            if path:
+                subfield_path = path + '.' + subfield._name
+            else:
+                subfield_path = subfield._name
+
+            _add_leaves(subfield, subfield_path, leaves)
+    elif isinstance(field, BreadArray):
+        if field._num_items == 0:
+            return
+
+        # Every item has the same layout as the first, shifted along by the
+        # length of an item, and the first item's accessors can encode and
+        # decode any item's values
+        item_path = '%s[0]' % (path)
+        item = field._get_accessor_item(0)
+        item_length = static_length(item)
+
+        item_leaves = collections.OrderedDict()
+        _add_leaves(item, item_path, item_leaves)
+        leaves.update(item_leaves)
+
+        for i in range(1, field._num_items):
+            for leaf_path, entry in item_leaves.items():
+                leaves['%s[%d]%s' % (path, i, leaf_path[len(item_path):])] = \
+                    LayoutEntry(entry.offset + i * item_length, entry.length,
+                                entry.field)
+    else:
+        leaves[path] = LayoutEntry(field._offset, field._length, field)
+
+
+def _compile_layout(struct):
+    length = static_length(struct)
+
+    if length is None:
+        return None
+
+    struct._offset = 0
+
+    leaves = collections.OrderedDict()
+    _add_leaves(struct, '', leaves)
+
+    return Layout(length, leaves)
+
+
+def compile_layout(spec):
+    """Compute the static layout of `spec`, or None if the position of any
+    of its fields depends on the data being parsed."""
+    return _layout_cache.get(
+        spec, None, lambda: _compile_layout(build_struct(spec)))
+
+
+def _named_field(field, name):
+    if isinstance(field, BreadConditional):
+        field = field._conditions[field._get_condition()]
+
+    if not isinstance(field, BreadStruct):
+        raise AttributeError("No known field '%s'" % (name))
+
+    if name in field._fields:
+        return field._fields[name]
+
+    for conditional_field in field._conditional_fields:
+        try:
+            return _named_field(conditional_field, name)
+        except AttributeError:
+            pass
+
+    raise AttributeError("No known field '%s'" % (name))
+
+
+def resolve_field(struct, path):
+    """Return the accessor object for the field at `path` (e.g.
+    'items[3].volume') within a parsed struct."""
+    field = struct
+
+    for component in parse_path(path):
+        if component == '*':
+            raise ValueError(
+                "Can't use [*] in the path of a single field ('%s')" % (path))
+        elif type(component) == int:
+            if (not isinstance(field, BreadArray) or
+                    component >= field._num_items):
+                raise AttributeError("No known field '%s'" % (path))
+
+            field = field._get_accessor_item(component)
+        else:
+            field = _named_field(field, component)
+
+    return field
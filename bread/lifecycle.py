@@ -2,9 +2,14 @@ import math
 
 from bitstring import BitArray
 
+from .batch import TrackedBits
+from .buffer import _data_bits_from_source
+from .eager import _parse_eagerly, decode_eagerly
+from .projection import project
 from .struct import BreadStruct, build_struct
 
-from .vendor import six
+# Functions called with (spec, struct) whenever new() creates a struct
+_new_struct_hooks = []
 
 
 def new(spec, type_name='bread_struct', data=None):
@@ -24,18 +29,48 @@ def new(spec, type_name='bread_struct', data=None):
              "bits, but data is only %d bits long") %
             (len(struct), len(data)))
 
+    for hook in _new_struct_hooks:
+        hook(spec, struct)
+
     return struct
 
 
-def parse(data_source, spec, type_name='bread_struct'):
-    if type(data_source) == str:
-        data_bits = BitArray(bytes=six.b(data_source))
-    elif type(data_source) == list:
-        data_bits = BitArray(bytes=data_source)
-    else:
-        data_bits = BitArray(data_source)
+def parse(data_source, spec, type_name='bread_struct', fields=None,
+          frozen=False, eager=False):
+    """Parse `data_source` according to `spec`.
+
+    If `fields` is given, only the fields with those paths (e.g.
+    'header.id' or 'items[*].volume') are parsed; see `project`.
+
+    memoryviews, mmaps and shared memory blocks are parsed in place without
+    being copied, and changes to the parsed struct are written straight to
+    them.
+
+    If `frozen` is True, the parsed struct is read-only and backed by an
+    immutable copy of the data (or by the data itself, if it's already a
+    read-only buffer), so it can be shared between threads.
+
+    If `eager` is True, every field is decoded up front and the result is
+    a namedtuple of plain values instead of a struct; see `decode_eagerly`.
+    """
+    if fields is not None:
+        spec = project(spec, fields)
 
-    return new(spec, type_name=type_name, data=data_bits)
+    if eager:
+        record = _parse_eagerly(data_source, spec, type_name)
+
+        if record is not None:
+            return record
+
+    data_bits = _data_bits_from_source(data_source, read_only=frozen)
+
+    struct = new(spec, type_name=type_name, data=data_bits)
+    struct._frozen = frozen
+
+    if eager:
+        return decode_eagerly(struct)
+
+    return struct
 
 
 def write(parsed_obj, spec=None, filename=None):
@@ -54,3 +89,34 @@ def write(parsed_obj, spec=None, filename=None):
             parsed_obj._data_bits[:parsed_obj._length].tofile(fp)
     else:
         return bytearray(parsed_obj._data_bits[:parsed_obj._length].tobytes())
+
+
+def write_changes(parsed_obj, fp):
+    """Write the parts of an object created by `parse` that have changed
+    since it was parsed (or since the last call to `write_changes`) to the
+    file object `fp`, which should contain the data it was parsed from.
+
+    Only changes made since the object was first batched with
+    `BreadStruct.batch` are tracked. Returns the (start, end) byte ranges
+    that were written.
+    """
+    if not isinstance(parsed_obj, BreadStruct):
+        raise ValueError(
+            'Object to write must be a structure created '
+            'by bread.parse')
+
+    data_bits = parsed_obj._data_bits
+
+    if not isinstance(data_bits, TrackedBits):
+        return []
+
+    data_bits.flush()
+    ranges = data_bits.dirty_ranges()
+
+    for start, end in ranges:
+        fp.seek(start)
+        fp.write(data_bits[start * 8:end * 8].tobytes())
+
+    data_bits.clear_dirty_ranges()
+
+    return ranges
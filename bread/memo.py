@@ -0,0 +1,64 @@
+import collections
+
+from .utils import _to_bytes
+
+
+class DecodeMemo(object):
+    """Shares the results of `as_native` between sub-structs with the same
+    spec and the same bytes, e.g. the many identical (often all-zero)
+    entries in a large table of records.
+
+    Pass a memo to `as_native(memo=...)`. Identical sub-structs get the same
+    decoded object, so the results shouldn't be modified. At most
+    `max_entries` results are kept, discarding the least recently used, and
+    structs longer than `max_item_bytes` aren't memoized at all.
+    """
+
+    def __init__(self, max_entries=1024, max_item_bytes=4096):
+        self.max_entries = max_entries
+        self.max_item_bytes = max_item_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        # (id of spec, raw bytes) -> (spec, decoded value). Entries hold on
+        # to their spec so that its id can't be reused while it's memoized.
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+
+        if lookups == 0:
+            return 0.0
+
+        return float(self.hits) / lookups
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, spec, raw_bytes, decode):
+        key = (id(spec), _to_bytes(raw_bytes))
+
+        if key in self._entries:
+            # Move the entry to the end, since it's the most recently used
+            entry = self._entries.pop(key)
+            self._entries[key] = entry
+            self.hits += 1
+
+            return entry[1]
+
+        self.misses += 1
+        value = decode()
+
+        self._entries[key] = (spec, value)
+
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        return value
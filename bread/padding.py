@@ -1,17 +1,65 @@
-from bitstring import pack
-from .field import BreadField
+class BreadPadding(object):
+    """Bits that are skipped over.
 
+    Padding has no value and never reads or writes the data, so it doesn't
+    need an offset or a reference to the data, and all padding of a given
+    length is the same object.
+    """
+    __slots__ = ('_length',)
 
-def padding(length):   # pragma: no cover
-    def make_padding_field(parent, **field_options):
-        def encode_pad(value):
-            return pack('pad:n', n=value)
+    _fixed_length = True
+
+    def __init__(self, length):
+        self._length = length
+
+    @property
+    def _name(self):
+        return '_padding'
+
+    @_name.setter
+    def _name(self, value):
+        # Padding is never named, so that it's skipped like unnamed fields
+        pass
+
+    @property
+    def _offset(self):
+        return None
+
+    @_offset.setter
+    def _offset(self, value):
+        pass
+
+    def _set_data(self, data_bits):
+        pass
+
+    def _clone(self, parent, data_bits, delta):
+        return self
+
+    def get(self):
+        return None
 
-        def decode_pad(encoded):
-            return None
+    def set(self, value):
+        raise ValueError("Can't set padding to a value")
 
-        return BreadField(
-            length, encode_pad, decode_pad,
-            str_format=field_options.get('str_format', None))
+    def as_native(self, memo=None):
+        return None
+
+    def __str__(self):
+        return 'None'
+
+
+_padding_fields = {}
+
+
+def _padding_field(length):
+    if length not in _padding_fields:
+        _padding_fields[length] = BreadPadding(length)
+
+    return _padding_fields[length]
+
+
+def padding(length):
+    def make_padding_field(parent, **field_options):
+        return _padding_field(length)
 
     return make_padding_field
@@ -0,0 +1,83 @@
+import os
+
+from .buffer import BufferBits
+from .layout import resolve_field
+from .lifecycle import parse
+from .registry import _spec_name, registered_spec
+
+
+def _map_array_range(shared_memory_name, spec_name, type_name, array_path,
+                     start, stop, fn):
+    from multiprocessing import shared_memory
+
+    # Pool processes share their parent's resource tracker, so attaching to
+    # the block here doesn't cause it to be destroyed when this process exits
+    block = shared_memory.SharedMemory(name=shared_memory_name)
+
+    try:
+        parsed = parse(block, registered_spec(spec_name), type_name=type_name)
+        items = resolve_field(parsed, array_path)
+
+        results = [fn(items[i]) for i in range(start, stop)]
+
+        # The parsed struct's view of the block has to be released before the
+        # block can be closed
+        parsed._data_bits.release()
+        del parsed, items
+
+        return results
+    finally:
+        block.close()
+
+
+def map_array(parsed, array_path, fn, processes=None):
+    """Call `fn` on every item of an array in a pool of processes.
+
+    `parsed` must have been parsed from a `SharedMemory` block with a spec
+    registered with `register_spec`, and `array_path` is the path of the
+    array within it (e.g. 'song.instruments'). The array is split into one
+    range of items per process, and each process parses the shared memory
+    block in place, so the block is never copied. `fn` must be picklable
+    (e.g. a module-level function) and its results are returned as a list,
+    in the same order as the array's items.
+    """
+    data_bits = parsed._data_bits
+
+    if (not isinstance(data_bits, BufferBits) or
+            data_bits.shared_memory_name is None):
+        raise ValueError(
+            "map_array requires a struct parsed from a SharedMemory block")
+
+    spec_name = _spec_name(parsed._spec)
+
+    if spec_name is None:
+        raise ValueError(
+            "map_array requires a struct parsed with a spec that has been "
+            "registered with register_spec")
+
+    # Imported here because concurrent.futures isn't available on Python 2,
+    # where every module is imported along with bread
+    import concurrent.futures
+
+    num_items = len(resolve_field(parsed, array_path))
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    range_size = max(1, -(-num_items // processes))
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes) as executor:
+        futures = [
+            executor.submit(
+                _map_array_range, data_bits.shared_memory_name, spec_name,
+                type(parsed).__name__, array_path, start,
+                min(start + range_size, num_items), fn)
+            for start in range(0, num_items, range_size)]
+
+        results = []
+
+        for future in futures:
+            results.extend(future.result())
+
+    return results
@@ -0,0 +1,122 @@
+import mmap
+import os
+
+from bitstring import BitArray
+
+from .buffer import BufferBits
+from .field import BreadField
+from .layout import resolve_field, static_length
+from .lifecycle import new
+from .struct import build_struct
+from .utils import _pread, _pwrite
+
+
+def _static_field(struct, path):
+    try:
+        field = resolve_field(struct, path)
+    except AttributeError:
+        raise ValueError("No known field '%s'" % (path))
+
+    if not isinstance(field, BreadField):
+        raise ValueError("No known field '%s'" % (path))
+
+    return field
+
+
+def _patch_static(fd, file_length, struct, changes):
+    # Only the fields being changed (and the array items containing them)
+    # are created, so patching a field of a huge array is cheap
+    struct._offset = 0
+
+    patches = []
+
+    for path, value in changes.items():
+        field = _static_field(struct, path)
+
+        if field._offset + field._length > file_length * 8:
+            raise ValueError(
+                "Field '%s' extends past the end of the file" % (path))
+
+        patches.append((field._offset, field._encode_fn(value)))
+
+    # Changes to fields that share bytes are read, modified and written
+    # together
+    patches.sort(key=lambda patch: patch[0])
+
+    groups = []
+
+    for offset, bits in patches:
+        first_byte = offset // 8
+        last_byte = (offset + len(bits) + 7) // 8
+
+        if groups and first_byte < groups[-1][1]:
+            groups[-1][1] = max(last_byte, groups[-1][1])
+            groups[-1][2].append((offset, bits))
+        else:
+            groups.append([first_byte, last_byte, [(offset, bits)]])
+
+    for first_byte, last_byte, group_patches in groups:
+        if (len(group_patches) == 1 and group_patches[0][0] % 8 == 0 and
+                len(group_patches[0][1]) % 8 == 0):
+            # Whole bytes don't need to be read first
+            chunk = BitArray(group_patches[0][1])
+        else:
+            chunk = BitArray(bytes=_pread(
+                fd, last_byte - first_byte, first_byte))
+
+            for offset, bits in group_patches:
+                chunk.overwrite(bits, offset - first_byte * 8)
+
+        _pwrite(fd, chunk.tobytes(), first_byte)
+
+
+def _patch_variable(fd, spec, changes):
+    mapping = mmap.mmap(fd, 0)
+    data_bits = BufferBits(mapping)
+
+    try:
+        parsed = new(spec, data=data_bits)
+
+        for path, value in changes.items():
+            parent_path, _, name = path.rpartition('.')
+
+            try:
+                if '[' in name:
+                    resolve_field(parsed, path).set(value)
+                else:
+                    # Named fields are set through their struct, which
+                    # checks that changes are allowed (e.g. that the number
+                    # of items in an array isn't being changed)
+                    parent = parsed
+
+                    if parent_path:
+                        parent = resolve_field(parsed, parent_path)
+
+                    setattr(parent, name, value)
+            except AttributeError:
+                raise ValueError("No known field '%s'" % (path))
+    finally:
+        # The mapping can't be closed while the struct's view of it exists
+        data_bits.release()
+        mapping.close()
+
+
+def patch(path, spec, changes):
+    """Change the values of some of the fields of the file at `path` in
+    place, reading and writing only the bytes containing those fields.
+
+    `changes` maps field paths (like 'header.flags.dirty' or
+    'items[42].volume') to their new values. If the spec's layout depends
+    on the data (i.e. it contains conditionals), the file is memory-mapped
+    and parsed in place to find the fields.
+    """
+    struct = build_struct(spec)
+
+    with open(path, 'r+b') as fp:
+        fd = fp.fileno()
+        file_length = os.fstat(fd).st_size
+
+        if static_length(struct) is not None:
+            _patch_static(fd, file_length, struct, changes)
+        else:
+            _patch_variable(fd, spec, changes)
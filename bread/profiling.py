@@ -0,0 +1,194 @@
+import contextlib
+import time
+
+from .array import BreadArray
+from .field import BreadField
+from .lifecycle import _new_struct_hooks
+from .struct import BreadConditional, BreadStruct
+
+# time.perf_counter isn't available on Python 2
+_timer = getattr(time, 'perf_counter', time.time)
+
+_STAT_NAMES = ('decodes', 'encodes', 'bit_allocations', 'cache_hits',
+               'cache_misses', 'time')
+
+
+def _add_field_paths(field, path, paths):
+    if isinstance(field, BreadConditional):
+        # Fields in a conditional appear to belong to the enclosing struct
+        for condition_struct in field._conditions.values():
+            _add_field_paths(condition_struct, path, paths)
+    elif isinstance(field, BreadStruct):
+        for subfield in field._field_list:
+            if isinstance(subfield, BreadConditional):
+                _add_field_paths(subfield, path, paths)
+            elif subfield._name is not None and subfield._name[0] != '_':
+                if path:
+                    subfield_path = path + '.' + subfield._name
+                else:
+                    subfield_path = subfield._name
+
+                _add_field_paths(subfield, subfield_path, paths)
+    elif isinstance(field, BreadArray):
+        # All of an array's items are counted together
+        for i in range(field._num_items):
+            _add_field_paths(field._get_accessor_item(i), path + '[*]', paths)
+    else:
+        # Hold on to the field so that its id can't be reused while the
+        # profile is running
+        paths[id(field)] = (field, path)
+
+
+class _CountingBits(object):
+    """Wraps a field's data while the field is being profiled, counting the
+    bitstrings that are sliced out of it"""
+
+    def __init__(self, data_bits):
+        self._data_bits = data_bits
+        self.slices = 0
+
+    def __len__(self):
+        return len(self._data_bits)
+
+    def __getattr__(self, attr):
+        return getattr(self._data_bits, attr)
+
+    def __getitem__(self, key):
+        self.slices += 1
+        return self._data_bits[key]
+
+
+class Profile(object):
+    """Statistics gathered by `profile` for each field path"""
+
+    def __init__(self, spec=None):
+        self._spec = spec
+        self._paths = {}
+        self._stats = {}
+
+    def _add_struct(self, spec, struct):
+        if self._spec is None or spec is self._spec:
+            _add_field_paths(struct, '', self._paths)
+
+    def _field_stats(self, field):
+        if id(field) not in self._paths:
+            return None
+
+        path = self._paths[id(field)][1]
+
+        if path not in self._stats:
+            self._stats[path] = dict((name, 0) for name in _STAT_NAMES)
+
+        return self._stats[path]
+
+    def as_dict(self):
+        """Return a dict mapping each field path that was accessed to a dict
+        of its statistics; times are in seconds"""
+        return dict((path, dict(stats))
+                    for path, stats in self._stats.items())
+
+    def table(self):
+        """Return the statistics as a table, most expensive fields first"""
+        header = '%-32s %8s %8s %8s %8s %8s %10s' % (
+            'field', 'decodes', 'encodes', 'allocs', 'hits', 'misses',
+            'time (ms)')
+
+        lines = [header, '-' * len(header)]
+
+        for path, stats in sorted(self._stats.items(),
+                                  key=lambda x: -x[1]['time']):
+            lines.append('%-32s %8d %8d %8d %8d %8d %10.3f' % (
+                path, stats['decodes'], stats['encodes'],
+                stats['bit_allocations'], stats['cache_hits'],
+                stats['cache_misses'], stats['time'] * 1000))
+
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.table()
+
+
+@contextlib.contextmanager
+def profile(spec=None):
+    """Profile field accesses made within a `with` block.
+
+    Counts decodes, encodes, bitstring allocations (bitstrings sliced out of
+    the data to decode a value, or encoded from a value) and value cache hits
+    and misses, and measures the time spent decoding and encoding, for each
+    field of the structs created by `parse` or `new` within the block
+    (only those created with `spec`, if it's given). Array items are counted
+    together under paths like 'items[*].volume'.
+
+    Yields a `Profile`. Fields aren't instrumented at all outside of a
+    profiling block.
+    """
+    stats = Profile(spec)
+
+    original_get = BreadField.get
+    original_set = BreadField.set
+
+    def profiled_get(field):
+        field_stats = stats._field_stats(field)
+
+        if field_stats is None:
+            return original_get(field)
+
+        if field._cached_value is not None:
+            field_stats['cache_hits'] += 1
+            return field._cached_value
+
+        # Fields that are decoded straight from their data's buffer don't
+        # slice a bitstring out of it
+        data_bits = field._data_bits
+        counting_bits = _CountingBits(data_bits)
+        field._data_bits = counting_bits
+
+        try:
+            start = _timer()
+            value = original_get(field)
+            field_stats['time'] += _timer() - start
+        finally:
+            field._data_bits = data_bits
+
+        field_stats['cache_misses'] += 1
+        field_stats['decodes'] += 1
+        field_stats['bit_allocations'] += counting_bits.slices
+
+        return value
+
+    def profiled_set(field, value):
+        field_stats = stats._field_stats(field)
+
+        if field_stats is None:
+            return original_set(field, value)
+
+        encode_fn = field._encode_fn
+        encoded = []
+
+        def counting_encode(value):
+            value_bits = encode_fn(value)
+            encoded.append(value_bits)
+            return value_bits
+
+        field._encode_fn = counting_encode
+
+        try:
+            start = _timer()
+            original_set(field, value)
+            field_stats['time'] += _timer() - start
+        finally:
+            field._encode_fn = encode_fn
+
+        field_stats['encodes'] += 1
+        field_stats['bit_allocations'] += len(encoded)
+
+    BreadField.get = profiled_get
+    BreadField.set = profiled_set
+    _new_struct_hooks.append(stats._add_struct)
+
+    try:
+        yield stats
+    finally:
+        BreadField.get = original_get
+        BreadField.set = original_set
+        _new_struct_hooks.remove(stats._add_struct)
@@ -0,0 +1,204 @@
+import types
+
+from .array import BreadArray, array
+from .constants import CONDITIONAL
+from .layout import parse_path, static_length
+from .padding import padding
+from .struct import build_struct
+from .utils import _SpecCache
+
+# Projections are cached so that repeatedly parsing with the same field list
+# doesn't rebuild the projected spec every time
+_projection_cache = _SpecCache()
+
+
+def _build_selection(fields):
+    selection = {}
+
+    for path in fields:
+        components = parse_path(path)
+
+        for component in components:
+            if type(component) == int:
+                raise ValueError(
+                    "Projections can only select whole arrays or all of an "
+                    "array's items with [*] ('%s')" % (path))
+
+        node = selection
+
+        for component in components[:-1]:
+            if component in node and node[component] is None:
+                # An ancestor of this path has already been selected in its
+                # entirety
+                break
+
+            node = node.setdefault(component, {})
+        else:
+            node[components[-1]] = None
+
+    return selection
+
+
+def _required_names(spec):
+    """Return the names of the fields in `spec` that other fields depend on:
+    fields that conditionals switch on and fields that hold the number of
+    items in an array"""
+    names = set()
+    global_options = {}
+
+    for spec_line in spec:
+        if type(spec_line) == dict:
+            global_options = spec_line
+        elif isinstance(spec_line, types.FunctionType) or len(spec_line) == 1:
+            continue
+        elif spec_line[0] == CONDITIONAL:
+            predicate_field_name, conditions = spec_line[1:]
+            names.add(predicate_field_name)
+
+            for condition in conditions.values():
+                names.update(_required_names(condition))
+        elif type(spec_line[1]) != list:
+            field = spec_line[1](None, **global_options)
+
+            if (isinstance(field, BreadArray) and
+                    field._length_field_name is not None):
+                names.add(field._length_field_name)
+
+    return names
+
+
+def _field_length(field_spec, options):
+    if type(field_spec) == list:
+        return static_length(build_struct(field_spec))
+    else:
+        return static_length(field_spec(None, **options))
+
+
+def _project_field(field_spec, subselection, options, path):
+    if subselection is None:
+        return field_spec
+
+    if type(field_spec) == list:
+        return _project_spec(field_spec, subselection, path + '.')[0]
+
+    field = field_spec(None, **options)
+
+    if not isinstance(field, BreadArray):
+        raise ValueError("Field '%s' has no subfields" % (path))
+
+    if list(subselection.keys()) != ['*']:
+        raise ValueError(
+            "Array field '%s' can only be projected with [*]" % (path))
+
+    item_spec = field._item_spec
+
+    if type(item_spec) == tuple and item_spec[0] == CONDITIONAL:
+        # Conditional items are parsed in their entirety
+        return field_spec
+
+    num_items = field._length_field_name or field._num_items
+
+    return array(num_items, _project_field(
+        item_spec, subselection['*'], field._field_options, path + '[*]'))
+
+
+def _project_spec(spec, selection, path='', validate=True):
+    projected_spec = []
+    found_names = set()
+
+    # Fields that other fields depend on have to stay parseable
+    kept_names = _required_names(spec)
+
+    global_options = {}
+    pending_padding = [0]
+
+    def flush_padding():
+        if pending_padding[0] > 0:
+            projected_spec.append(padding(pending_padding[0]))
+            pending_padding[0] = 0
+
+    def skip_or_keep(spec_line, field_spec, options):
+        length = _field_length(field_spec, options)
+
+        if length is None:
+            flush_padding()
+            projected_spec.append(spec_line)
+        else:
+            pending_padding[0] += length
+
+    for spec_line in spec:
+        if type(spec_line) == dict:
+            global_options = spec_line
+            flush_padding()
+            projected_spec.append(spec_line)
+        elif isinstance(spec_line, types.FunctionType) or len(spec_line) == 1:
+            if isinstance(spec_line, types.FunctionType):
+                field_spec = spec_line
+            else:
+                field_spec = spec_line[0]
+
+            skip_or_keep(spec_line, field_spec, global_options)
+        elif spec_line[0] == CONDITIONAL:
+            predicate_field_name, conditions = spec_line[1:]
+
+            projected_conditions = {}
+
+            for predicate_value, condition in conditions.items():
+                # Fields inside a conditional appear to belong to the
+                # enclosing struct, so each case is projected with the same
+                # selection and validated along with the enclosing struct.
+                projected_condition, condition_names = _project_spec(
+                    condition, selection, path, validate=False)
+                projected_conditions[predicate_value] = projected_condition
+                found_names.update(condition_names)
+
+            flush_padding()
+            projected_spec.append(
+                (CONDITIONAL, predicate_field_name, projected_conditions))
+        else:
+            field_name = spec_line[0]
+            field_spec = spec_line[1]
+            options = global_options
+
+            if len(spec_line) == 3:
+                options = global_options.copy()
+                options.update(spec_line[2])
+
+            field_path = path + field_name
+
+            if field_name in selection:
+                found_names.add(field_name)
+                flush_padding()
+                projected_spec.append(
+                    (field_name, _project_field(
+                        field_spec, selection[field_name], options,
+                        field_path)) + tuple(spec_line[2:]))
+            elif field_name in kept_names:
+                flush_padding()
+                projected_spec.append(spec_line)
+            else:
+                skip_or_keep(spec_line, field_spec, options)
+
+    flush_padding()
+
+    if validate:
+        for name in selection:
+            if name not in found_names:
+                raise ValueError("No known field '%s'" % (path + name))
+
+    return projected_spec, found_names
+
+
+def project(spec, fields):
+    """Produce a spec that only parses the fields named in `fields`.
+
+    Fields are named by path (e.g. 'header.id' or 'items[*].volume'). Every
+    other field whose length doesn't depend on the data is replaced by
+    padding, so parsing the projected spec only builds accessors for the
+    fields that were asked for.
+    """
+    fields = tuple(fields)
+
+    return _projection_cache.get(
+        spec, fields,
+        lambda: _project_spec(spec, _build_selection(fields))[0])
@@ -0,0 +1,472 @@
+import binascii
+
+from bitstring import Bits, CreationError
+
+from .buffer import BufferBits
+from .compression import _sniff_compression, stream_chunks
+from .layout import compile_layout, resolve_field
+from .lifecycle import parse
+from .struct import build_struct
+from .utils import (
+    _byte_view, _import_optional, _release_view, _to_bytes)
+
+# Predicates on fields at most this many bits long are evaluated up front for
+# every possible value of the field, so that records can be matched by
+# comparing raw codes instead of decoding values
+_ENUMERABLE_BITS = 8
+
+# Enums at most this many bits long whose default matches a predicate have
+# the codes that decode to their default enumerated too
+_ENUMERABLE_DEFAULT_BITS = 16
+
+
+def _read_source(source):
+    if hasattr(source, 'read'):
+        source = source.read()
+
+    return _byte_view(source)
+
+
+def _make_predicate(expected):
+    if callable(expected):
+        return expected
+    else:
+        return lambda value: value == expected
+
+
+def _code_position(entry):
+    # A field's raw code is found in the bytes spanning the field, shifted
+    # right to drop the bits that follow it and masked to drop the bits that
+    # precede it
+    first_byte = entry.offset // 8
+    last_byte = (entry.offset + entry.length + 7) // 8
+    shift = last_byte * 8 - (entry.offset + entry.length)
+    mask = (1 << entry.length) - 1
+
+    return first_byte, last_byte, shift, mask
+
+
+def _bytes_to_int(data):
+    # Big-endian; int.from_bytes isn't available on Python 2
+    return int(binascii.hexlify(data), 16)
+
+
+def _decode_code(entry, code):
+    return entry.field._decode_fn(Bits(uint=code, length=entry.length))
+
+
+def _int_code(value, length, type_info):
+    """Return the raw code that an integer field encodes `value` as, or None
+    if the field can't hold it"""
+    value -= type_info['offset']
+
+    if type_info['signed'] and value < 0:
+        value += 1 << length
+
+    if not 0 <= value < (1 << length):
+        return None
+
+    if type_info['little_endian']:
+        swapped = 0
+
+        for _ in range(length // 8):
+            swapped = (swapped << 8) | (value & 0xff)
+            value >>= 8
+
+        value = swapped
+
+    return value
+
+
+def _matching_enum_codes(entry, type_info, predicate):
+    length = entry.length
+    default = type_info['default']
+
+    # Several integers (and so several codes) can decode to the same value
+    codes = {}
+
+    for decoded, value in type_info['values'].items():
+        code = _int_code(decoded, length, type_info)
+
+        if code is not None:
+            codes[code] = predicate(value)
+
+    matching_codes = set(code for code, matches in codes.items() if matches)
+
+    if default is None or not predicate(default):
+        return matching_codes
+
+    # Every other code decodes to the default
+    if length > _ENUMERABLE_DEFAULT_BITS:
+        return None
+
+    matching_codes.update(
+        code for code in range(1 << length) if code not in codes)
+
+    return matching_codes
+
+
+def _matching_codes(entry, expected, predicate):
+    """Return the set of raw codes for which `entry` satisfies `predicate`,
+    or None if that set can't be computed up front."""
+    type_info = entry.field._type_info or {}
+
+    if entry.length <= _ENUMERABLE_BITS:
+        codes = set()
+
+        for code in range(1 << entry.length):
+            try:
+                value = _decode_code(entry, code)
+            except ValueError:
+                # The code doesn't decode to anything (e.g. an enum value
+                # that isn't in the enum), so it can't match
+                continue
+
+            if predicate(value):
+                codes.add(code)
+
+        return codes
+    elif type_info.get('kind') == 'enum':
+        return _matching_enum_codes(entry, type_info, predicate)
+    elif (not callable(expected) and
+          type_info.get('kind') in ('int', 'string')):
+        # Integers and strings have only one encoding of each value
+        try:
+            encoded = entry.field._encode_fn(expected)
+        except (ValueError, CreationError):
+            return set()
+
+        if len(encoded) != entry.length:
+            return set()
+
+        return set([encoded.uint])
+    else:
+        return None
+
+
+def _compile_predicates(layout, where):
+    predicates = []
+
+    for path, expected in where.items():
+        if path not in layout.leaves:
+            raise ValueError("No known field '%s'" % (path))
+
+        entry = layout.leaves[path]
+        predicate = _make_predicate(expected)
+
+        predicates.append(
+            (entry, predicate, _matching_codes(entry, expected, predicate)))
+
+    return predicates
+
+
+def _probe_matches(probe, predicates):
+    for path, predicate in predicates:
+        try:
+            field = resolve_field(probe, path)
+        except AttributeError:
+            # The record's conditionals don't include the field
+            return False
+
+        if not predicate(field.get()):
+            return False
+
+    return True
+
+
+def _record_matches(data, record_start, predicates):
+    for entry, predicate, codes in predicates:
+        first_byte, last_byte, shift, mask = _code_position(entry)
+
+        code = (_bytes_to_int(
+            data[record_start + first_byte:record_start + last_byte]) >>
+            shift) & mask
+
+        if codes is not None:
+            if code not in codes:
+                return False
+        elif not predicate(_decode_code(entry, code)):
+            return False
+
+    return True
+
+
+def _matching_records_numpy(numpy, data, num_records, record_bytes,
+                            predicates):
+    records = numpy.frombuffer(
+        data, dtype=numpy.uint8, count=num_records * record_bytes).reshape(
+            num_records, record_bytes)
+
+    matches = numpy.ones(num_records, dtype=bool)
+    remaining_predicates = []
+
+    for entry, predicate, codes in predicates:
+        first_byte, last_byte, shift, mask = _code_position(entry)
+
+        if codes is None or last_byte - first_byte > 8:
+            remaining_predicates.append((entry, predicate, codes))
+            continue
+
+        field_codes = numpy.zeros(num_records, dtype=numpy.uint64)
+
+        for column in range(first_byte, last_byte):
+            field_codes = (field_codes << numpy.uint64(8)) | records[:, column]
+
+        field_codes = (
+            (field_codes >> numpy.uint64(shift)) & numpy.uint64(mask))
+
+        matches &= numpy.isin(
+            field_codes, numpy.array(sorted(codes), dtype=numpy.uint64))
+
+    for index in numpy.flatnonzero(matches):
+        index = int(index)
+
+        if _record_matches(data, index * record_bytes, remaining_predicates):
+            yield index
+
+
+def _scan_fixed(data, layout, where):
+    record_bytes = (layout.length + 7) // 8
+
+    if record_bytes == 0 or len(data) % record_bytes != 0:
+        raise ValueError(
+            "Data is %d bytes long, which isn't a whole number of %d-byte "
+            "records" % (len(data), record_bytes))
+
+    num_records = len(data) // record_bytes
+    predicates = _compile_predicates(layout, where)
+
+    numpy = _import_optional('numpy')
+
+    if numpy is not None and len(predicates) > 0:
+        matching_records = _matching_records_numpy(
+            numpy, data, num_records, record_bytes, predicates)
+    else:
+        matching_records = (
+            i for i in range(num_records)
+            if _record_matches(data, i * record_bytes, predicates))
+
+    for i in matching_records:
+        yield i * record_bytes, record_bytes
+
+
+def _scan_variable(data, spec, where):
+    data_bits = BufferBits(data)
+
+    # A single struct is moved from record to record to find each record's
+    # length and evaluate predicates on it
+    probe = build_struct(spec)
+    probe._set_data(data_bits)
+
+    predicates = [(path, _make_predicate(expected))
+                  for path, expected in where.items()]
+
+    min_length = probe._get_min_length()
+    offset = 0
+
+    try:
+        while offset < len(data_bits):
+            if offset + min_length > len(data_bits):
+                raise ValueError(
+                    "Record at byte %d is truncated" % (offset // 8))
+
+            probe._offset = offset
+            length = len(probe)
+
+            if offset + length > len(data_bits):
+                raise ValueError(
+                    "Record at byte %d is truncated" % (offset // 8))
+
+            record_bytes = (length + 7) // 8
+
+            if _probe_matches(probe, predicates):
+                yield offset // 8, record_bytes
+
+            offset += record_bytes * 8
+    finally:
+        # Don't leave the data's buffer exported once scanning is done (the
+        # probe struct may not be garbage collected right away), so that
+        # the data's mmap, if any, can be closed
+        data_bits.release()
+
+
+def _record_spans(data, spec, where):
+    """Iterate over the (byte offset, length in bytes) of every record in
+    `data` that satisfies `where`."""
+    layout = compile_layout(spec)
+
+    if layout is not None:
+        return _scan_fixed(data, layout, where)
+    else:
+        return _scan_variable(data, spec, where)
+
+
+def _stream_fixed(chunks, layout, where):
+    record_bytes = (layout.length + 7) // 8
+    buf = bytearray()
+    base = 0
+
+    for chunk in chunks:
+        buf += chunk
+        complete = len(buf) - len(buf) % record_bytes
+
+        if complete == 0:
+            continue
+
+        view = memoryview(buf)[:complete]
+
+        try:
+            records = [(base + offset, view[offset:offset + length].tobytes())
+                       for offset, length in _scan_fixed(view, layout, where)]
+        finally:
+            # The buffer can't be resized while it's viewed
+            _release_view(view)
+
+        for record in records:
+            yield record
+
+        # Only part of a record can be left over, so this copies little (and
+        # unlike deleting the records, works even if the buffer is still
+        # viewed, as it is on Python 2, where views can't be released)
+        buf = buf[complete:]
+        base += complete
+
+    if len(buf) > 0:
+        raise ValueError(
+            "Data is %d bytes long, which isn't a whole number of %d-byte "
+            "records" % (base + len(buf), record_bytes))
+
+
+def _stream_variable(chunks, spec, where):
+    probe = build_struct(spec)
+    min_length = probe._get_min_length()
+
+    predicates = [(path, _make_predicate(expected))
+                  for path, expected in where.items()]
+
+    chunks = iter(chunks)
+    buf = bytearray()
+    base = 0
+    exhausted = False
+
+    while not exhausted or len(buf) > 0:
+        chunk = next(chunks, None)
+
+        if chunk is None:
+            exhausted = True
+        else:
+            buf += chunk
+
+        records = []
+        consumed = 0
+
+        data_bits = BufferBits(buf)
+        probe._set_data(data_bits)
+
+        try:
+            while consumed < len(buf):
+                offset = consumed * 8
+
+                # Records that run past the end of the buffer may just not
+                # have been read completely yet
+                try:
+                    if offset + min_length > len(data_bits):
+                        raise ValueError('Record is truncated')
+
+                    probe._offset = offset
+                    length = len(probe)
+
+                    if offset + length > len(data_bits):
+                        raise ValueError('Record is truncated')
+                except (ValueError, CreationError):
+                    if not exhausted:
+                        break
+
+                    raise ValueError(
+                        "Record at byte %d is truncated" % (base + consumed))
+
+                record_bytes = (length + 7) // 8
+
+                if _probe_matches(probe, predicates):
+                    records.append((base + consumed, _to_bytes(
+                        buf[consumed:consumed + record_bytes])))
+
+                consumed += record_bytes
+        finally:
+            data_bits.release()
+
+        for record in records:
+            yield record
+
+        # See _stream_fixed
+        buf = buf[consumed:]
+        base += consumed
+
+
+def _stream_records(chunks, spec, where):
+    """Iterate over the (byte offset, bytes) of every record in a stream of
+    chunks of data that satisfies `where`, only holding on to the data of
+    one chunk's worth of records at a time"""
+    layout = compile_layout(spec)
+
+    if layout is not None:
+        return _stream_fixed(chunks, layout, where)
+    else:
+        return _stream_variable(chunks, spec, where)
+
+
+def scan(source, spec, where=None, type_name='bread_struct', offsets=False,
+         compression='auto'):
+    """Iterate over the records in `source` that satisfy `where`.
+
+    `source` is a bytes-like object or a file object containing back-to-back
+    records described by `spec`, each starting on a byte boundary. `where`
+    maps field paths (e.g. 'header.id' or 'items[3].volume') to either a
+    value that the field must equal or a function that returns True for the
+    values that match.
+
+    When every record has the same length, predicates are evaluated on the
+    raw bytes of each record without parsing it (using NumPy if it's
+    installed), and only matching records are parsed.
+
+    Yields parsed records, or the byte offsets of matching records if
+    `offsets` is True.
+
+    File objects and compressed data are read and decompressed a chunk at a
+    time rather than all at once. gzip, bz2 and xz data is detected from its
+    magic bytes if `compression` is 'auto'; otherwise `compression` is one
+    of 'gzip', 'bz2', 'xz' or None (meaning uncompressed), and offsets are
+    offsets into the decompressed data.
+    """
+    if where is None:
+        where = {}
+
+    if compression == 'auto' and not hasattr(source, 'read'):
+        compression = _sniff_compression(source)
+
+    if hasattr(source, 'read') or compression is not None:
+        records = _stream_records(
+            stream_chunks(source, compression), spec, where)
+
+        for record_offset, record_data in records:
+            if offsets:
+                yield record_offset
+            else:
+                yield parse(record_data, spec, type_name=type_name)
+
+        return
+
+    data = _read_source(source)
+
+    for record_offset, record_bytes in _record_spans(data, spec, where):
+        if offsets:
+            yield record_offset
+        else:
+            yield parse(
+                data[record_offset:record_offset + record_bytes].tobytes(),
+                spec, type_name=type_name)
+
+
+def iter_parse(source, spec, type_name='bread_struct', compression='auto'):
+    """Iterate over every record in `source`; see `scan`."""
+    return scan(source, spec, type_name=type_name, compression=compression)
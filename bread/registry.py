@@ -0,0 +1,44 @@
+from .lifecycle import parse
+
+# Registered specs, by name and by id. Entries in _spec_names hold on to their
+# spec so that its id can't be reused while it's registered.
+_specs = {}
+_spec_names = {}
+
+
+def register_spec(name, spec):
+    """Register `spec` under `name` so that structs parsed with it can be
+    pickled.
+
+    A pickled struct is stored as its spec's name and its raw bytes, and is
+    re-parsed when it's unpickled, so `spec` has to be registered under the
+    same name in the process that unpickles it (e.g. by registering it when
+    the module that defines it is imported). Returns `spec`.
+    """
+    if name in _specs and _specs[name] is not spec:
+        raise ValueError(
+            "A different spec is already registered as '%s'" % (name))
+
+    _specs[name] = spec
+    _spec_names[id(spec)] = (name, spec)
+
+    return spec
+
+
+def registered_spec(name):
+    """Return the spec registered under `name`"""
+    if name not in _specs:
+        raise KeyError("No spec registered as '%s'" % (name))
+
+    return _specs[name]
+
+
+def _spec_name(spec):
+    if id(spec) not in _spec_names:
+        return None
+
+    return _spec_names[id(spec)][0]
+
+
+def _unpickle_struct(spec_name, data, type_name):
+    return parse(data, registered_spec(spec_name), type_name=type_name)
@@ -1,8 +1,17 @@
-from bitstring import BitArray
+import codecs
+
 from .field import BreadField
+from .utils import _raw_bytes, _to_bytes
+
 
+def string(length, encoding='utf-8', raw=False, nul_padded=False):
+    """A `length`-byte string.
 
-def string(length, encoding='utf-8'):
+    If `raw` is True, the string's bytes are returned as they are instead of
+    being decoded. If `nul_padded` is True, trailing NUL bytes are stripped
+    from the string when it's decoded, and shorter values are padded with
+    NULs when it's encoded.
+    """
     def make_string_field(parent, **field_options):
         length_in_bits = length * 8
 
@@ -10,12 +19,144 @@ def string(length, encoding='utf-8'):
             if type(value) != bytes:
                 value = value.encode(encoding)
 
+            if len(value) < length and nul_padded:
+                value += b'\0' * (length - len(value))
+            elif len(value) > length:
+                raise ValueError(
+                    "%r is too long for a %d-byte string" % (value, length))
+
+            # bitstring is only imported once it's needed
+            from bitstring import BitArray
+
             return BitArray(bytes=value)
 
+        def decode_string_bytes(value):
+            if nul_padded:
+                end = len(value)
+
+                while end > 0 and value[end - 1] in (0, b'\0'):
+                    end -= 1
+
+                value = value[:end]
+
+            if raw:
+                return _to_bytes(value)
+
+            # Decodes any bytes-like object (like a memoryview of the data)
+            # without copying it first
+            return codecs.decode(value, encoding)
+
         def decode_string(encoded):
-            return encoded.bytes.decode(encoding)
+            return decode_string_bytes(encoded.bytes)
 
         return BreadField(length_in_bits, encode_string, decode_string,
-                          str_format=field_options.get('str_format', None))
+                          str_format=field_options.get('str_format', None),
+                          type_info={'kind': 'string', 'encoding': encoding,
+                                     'raw': raw, 'nul_padded': nul_padded},
+                          decode_bytes_fn=decode_string_bytes)
 
     return make_string_field
+
+
+class CStringField(BreadField):
+    """A NUL-terminated string field, whose length (including its
+    terminator) is found by searching the data for the terminator"""
+
+    __slots__ = ('_max_length', '_cached_length')
+
+    # The field's length depends on the data
+    _fixed_length = False
+
+    def __init__(self, max_length, encode_fn, decode_fn, str_format,
+                 type_info=None, decode_bytes_fn=None):
+        self._max_length = max_length
+
+        super(CStringField, self).__init__(
+            None, encode_fn, decode_fn, str_format, type_info=type_info,
+            decode_bytes_fn=decode_bytes_fn)
+
+    @property
+    def _length(self):
+        if self._data_bits is None or self._offset is None:
+            # An empty string
+            return 8
+
+        if self._cached_length is None:
+            start = self._offset
+            end = min(start + self._max_length * 8, len(self._data_bits))
+
+            terminator = _to_bytes(_raw_bytes(
+                self._data_bits, start, end - start)).find(b'\0')
+
+            if terminator == -1:
+                raise ValueError(
+                    "String at bit %d isn't NUL-terminated within %d bytes" %
+                    (start, self._max_length))
+
+            self._cached_length = (terminator + 1) * 8
+
+        return self._cached_length
+
+    @_length.setter
+    def _length(self, value):
+        # Lengths are found from the data instead
+        self._cached_length = value
+
+    @BreadField._offset.setter
+    def _offset(self, value):
+        BreadField._offset.fset(self, value)
+        self._cached_length = None
+
+    def _set_data(self, data_bits):
+        super(CStringField, self)._set_data(data_bits)
+        self._cached_length = None
+
+    def _clone(self, parent, data_bits, delta):
+        clone = super(CStringField, self)._clone(parent, data_bits, delta)
+        clone._max_length = self._max_length
+        clone._cached_length = self._cached_length
+
+        return clone
+
+    def set(self, value):
+        if self._data_bits is not None and self._offset is not None:
+            value_bits = self._encode_fn(value)
+
+            if len(value_bits) != self._length:
+                raise ValueError(
+                    "Can't change the length of a NUL-terminated string in "
+                    "place (from %d to %d bytes)" %
+                    (self._length // 8, len(value_bits) // 8))
+
+        super(CStringField, self).set(value)
+
+
+def cstring(max_length, encoding='utf-8'):
+    """A NUL-terminated string of at most `max_length` bytes, including the
+    terminator.
+
+    Setting a string to a value of a different length raises a ValueError,
+    since the fields that follow it can't move.
+    """
+    def make_cstring_field(parent, **field_options):
+        def encode_cstring(value):
+            if type(value) != bytes:
+                value = value.encode(encoding)
+
+            from bitstring import BitArray
+
+            return BitArray(bytes=value + b'\0')
+
+        def decode_cstring_bytes(value):
+            return codecs.decode(value[:-1], encoding)
+
+        def decode_cstring(encoded):
+            return decode_cstring_bytes(encoded.bytes)
+
+        return CStringField(
+            max_length, encode_cstring, decode_cstring,
+            str_format=field_options.get('str_format', None),
+            type_info={'kind': 'cstring', 'encoding': encoding},
+            decode_bytes_fn=decode_cstring_bytes)
+
+    return make_cstring_field
@@ -1,14 +1,32 @@
-import json
+import contextlib
 import types
 
-from bitstring import CreationError
-
 from .constants import CONDITIONAL
 from .errors import BadConditionalCaseError
-from .utils import indent_text
+from .field import BreadField
+from .padding import _padding_field
+from .utils import _raw_bytes, _to_bytes, indent_text
 
 
 class BreadStruct(object):
+    # Bookkeeping that most structs never change is kept as class-level
+    # defaults, so that building a struct doesn't pay for __setattr__
+
+    # The names of fields that hold the number of items in an array
+    _count_fields = frozenset()
+
+    # The spec that this struct was built from
+    _spec = None
+
+    # True if the struct was parsed read-only
+    _frozen = False
+
+    # Whether the offsets of the struct's fields are independent of its
+    # data; computed the first time the struct is rebound
+    _fixed_layout = None
+
+    _start_offset = None
+
     def __init__(self):
         self._data_bits = None
         self._fields = {}
@@ -21,24 +39,69 @@ class BreadStruct(object):
             pass
         self.__offsets__ = Offsets()
 
+    def _raw_bytes(self):
+        return _raw_bytes(self._data_bits, self._offset, len(self))
+
     def __eq__(self, other):
-        if not hasattr(other, '_data_bits'):
+        if not isinstance(other, BreadStruct):
             return False
 
-        return self._data_bits == other._data_bits
+        # Structs are equal if their own bits are equal, regardless of the
+        # data around them
+        if len(self) != len(other):
+            return False
+
+        return self._raw_bytes() == other._raw_bytes()
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def __hash__(self):
+        if not getattr(self._data_bits, 'read_only', False):
+            raise TypeError(
+                "Can't hash a struct that can be modified; parse it with "
+                "frozen=True to make it hashable")
+
+        return hash((len(self), _to_bytes(self._raw_bytes())))
+
     def __len__(self):
         return self._compute_length()
 
+    def __reduce__(self):
+        # Imported here because registry depends on lifecycle, which depends
+        # on this module
+        import pickle
+
+        from .registry import _spec_name, _unpickle_struct
+
+        spec_name = _spec_name(self._spec)
+
+        if spec_name is None:
+            raise pickle.PicklingError(
+                "Can't pickle a struct unless it was parsed with a spec "
+                "that has been registered with register_spec")
+
+        offset = self._offset
+        data = self._data_bits[offset:offset + len(self)].tobytes()
+
+        return (_unpickle_struct, (spec_name, data, type(self).__name__))
+
     def _get_min_length(self):
         total_length = 0
 
         for field in self._field_list:
-            if isinstance(field, BreadConditional):
+            if isinstance(field, (BreadConditional, BreadStruct)):
                 total_length += field._get_min_length()
+            elif (getattr(field, '_length_field_name', None) is not None or
+                  getattr(field, '_item_length', 0) is None):
+                # The array's number of items or the lengths of its items
+                # come from the data, so it may be empty or shorter than it
+                # is now
+                continue
+            elif not getattr(field, '_fixed_length', True):
+                # A field whose length comes from the data is at least a
+                # byte long (e.g. a cstring's terminator)
+                total_length += 8
             else:
                 total_length += field._length
 
@@ -72,11 +135,11 @@ class BreadStruct(object):
 
     @property
     def _offset(self):
-        # A struct's offset is the offset where its first field starts
-        return self._field_list[0]._offset
+        return self._start_offset
 
     @_offset.setter
     def _offset(self, value):
+        object.__setattr__(self, '_start_offset', value)
         offset = value
 
         # All fields offsets are relative to the starting offset for the struct
@@ -96,9 +159,139 @@ class BreadStruct(object):
     def set(self, value):
         raise ValueError("Can't set a non-leaf struct to a value")
 
+    def rebind(self, data_source):
+        """Point this struct at new data (anything that `parse` accepts)
+        without rebuilding it.
+
+        Cached values are discarded, and fields' offsets are only
+        recomputed if they depend on the data (i.e. the struct contains
+        conditionals). Returns the struct.
+        """
+        # Imported here because these modules depend on this one
+        from .buffer import _data_bits_from_source
+        from .layout import static_length
+
+        data_bits = _data_bits_from_source(
+            data_source, read_only=self._frozen)
+
+        if self._get_min_length() > len(data_bits):
+            raise ValueError(
+                ("Data being parsed isn't long enough; expected at least %d "
+                 "bits, but data is only %d bits long") %
+                (self._get_min_length(), len(data_bits)))
+
+        if self._fixed_layout is None:
+            self._fixed_layout = static_length(self) is not None
+
+        self._set_data(data_bits)
+
+        if not self._fixed_layout:
+            self._offset = self._offset
+
+        return self
+
+    def clone(self):
+        """Return a copy of the struct that can be changed without changing
+        the original.
+
+        The copy shares the original's spec and layout instead of building
+        them again. Clones of frozen structs share the original's data until
+        they're first changed, when the bytes that the clone spans are
+        copied; since other structs' data can still change, their clones
+        start with their own copy of the bytes that the struct spans.
+        """
+        # Imported here because buffer depends on bitstring, which is only
+        # imported when it's needed
+        from .buffer import BufferBits, CopyOnWriteBits
+
+        data_bits = self._data_bits
+
+        if isinstance(data_bits, CopyOnWriteBits):
+            data_bits = data_bits._data_bits
+
+        raw_bytes = _raw_bytes(data_bits, self._offset, len(self))
+
+        if getattr(data_bits, 'read_only', False):
+            clone_bits = CopyOnWriteBits(BufferBits(raw_bytes))
+        else:
+            # The copy is the clone's own, so it can be changed in place
+            clone_bits = BufferBits(bytearray(raw_bytes))
+
+        # The clone's data starts at the start of the struct
+        return self._clone(None, clone_bits, self._offset)
+
+    def _clone(self, parent, data_bits, delta):
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+
+        clone._data_bits = data_bits
+        clone._frozen = False
+
+        if self._start_offset is not None:
+            clone._start_offset = self._start_offset - delta
+
+        field_list = [field._clone(clone, data_bits, delta)
+                      for field in self._field_list]
+        field_clones = dict(zip(map(id, self._field_list), field_list))
+
+        clone._field_list = field_list
+        clone._conditional_fields = [
+            field_clones[id(field)] for field in self._conditional_fields]
+        clone._fields = dict(
+            (name, field_clones[id(field)])
+            for name, field in self._fields.items())
+
+        offsets = object.__new__(type(self.__offsets__))
+        offsets.__dict__.update(
+            (name, offset if offset is None else offset - delta)
+            for name, offset in vars(self.__offsets__).items())
+
+        clone.__offsets__ = offsets
+
+        return clone
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Buffer changes made to the struct's fields inside a `with` block
+        and apply them when the block exits, combining changes to adjacent
+        fields into a single write.
+
+        Once a struct has been batched, the byte ranges of its data that have
+        changed are also tracked so that `write_changes` can write only those
+        ranges back out.
+        """
+        # Imported here so that batching's dependencies are only imported
+        # when a struct is batched
+        from .batch import TrackedBits
+
+        if self._frozen:
+            raise ValueError("Can't modify a read-only struct")
+
+        data_bits = self._data_bits
+
+        if not isinstance(data_bits, TrackedBits):
+            data_bits = TrackedBits(data_bits)
+            self._set_data(data_bits)
+
+        data_bits._batch_depth += 1
+
+        try:
+            yield self
+        finally:
+            data_bits._batch_depth -= 1
+
+            if data_bits._batch_depth == 0:
+                data_bits.flush()
+
     def __getattr__(self, attr):
-        if attr in ('_LENGTH', '_length'):
-            return self._compute_length()
+        if attr[:1] == '_':
+            if attr in ('_LENGTH', '_length'):
+                return self._compute_length()
+
+            if attr[:2] == '__':
+                # Special attributes are never fields (and may be looked up
+                # before __init__ has run, e.g. by copy or pickle)
+                raise AttributeError(attr)
 
         if attr in self._fields:
             return self._fields[attr].get()
@@ -117,6 +310,15 @@ class BreadStruct(object):
                 super(BreadStruct, self).__setattr__(attr, value)
             elif attr in self._fields:
                 field = self._fields[attr]
+
+                if attr in self._count_fields and value != field.get():
+                    # Like the length of a cstring, the number of items in
+                    # an array can't change, since the fields that follow
+                    # it can't move
+                    raise ValueError(
+                        "Can't change the number of items in an array in "
+                        "place (field '%s')" % (attr))
+
                 field.set(value)
             else:
                 for conditional_field in self._conditional_fields:
@@ -126,7 +328,13 @@ class BreadStruct(object):
                         pass
 
                 raise AttributeError("No known field '%s'" % (attr))
-        except CreationError as e:
+        except ValueError as e:
+            # bitstring is imported by then, since it encoded the value
+            from bitstring import CreationError
+
+            if not isinstance(e, CreationError):
+                raise
+
             raise ValueError('Error while setting %s: %s' % (field._name, e))
 
     def _add_field(self, field, name):
@@ -138,21 +346,43 @@ class BreadStruct(object):
 
         if isinstance(field, BreadConditional):
             self._conditional_fields.append(field)
+        elif not isinstance(field, BreadStruct):
+            length_field_name = getattr(field, '_length_field_name', None)
+
+            if length_field_name is not None:
+                self._count_fields = self._count_fields.union(
+                    [length_field_name])
+
+    def as_native(self, memo=None):
+        """Return the struct's fields as a dictionary.
 
-    def as_native(self):
+        If a `DecodeMemo` is given, sub-structs that have already been
+        decoded with the same spec and bytes share the earlier result.
+        """
+        if (memo is not None and self._spec is not None and
+                len(self) <= memo.max_item_bytes * 8):
+            return memo._lookup(
+                self._spec, self._raw_bytes(),
+                lambda: self._native_fields(memo))
+
+        return self._native_fields(memo)
+
+    def _native_fields(self, memo):
         native_struct = {}
 
         for field in self._field_list:
             if isinstance(field, BreadConditional):
-                native_struct.update(field.as_native())
+                native_struct.update(field.as_native(memo))
             elif field._name[0] != '_':
-                native_struct[field._name] = field.as_native()
+                native_struct[field._name] = field.as_native(memo)
             elif isinstance(field, BreadConditional):
-                native_struct.update(field.as_native())
+                native_struct.update(field.as_native(memo))
 
         return native_struct
 
     def as_json(self):
+        import json
+
         return json.dumps(self.as_native())
 
 
@@ -182,6 +412,17 @@ class BreadConditional(object):
         for struct in list(self._conditions.values()):
             struct._set_data(data_bits)
 
+    def _clone(self, parent, data_bits, delta):
+        clone = object.__new__(BreadConditional)
+        clone._name = self._name
+        clone._parent_struct = parent
+        clone._conditional_field_name = self._conditional_field_name
+        clone._conditions = dict(
+            (predicate_value, struct._clone(parent, data_bits, delta))
+            for predicate_value, struct in self._conditions.items())
+
+        return clone
+
     def _add_condition(self, predicate_value, struct):
         self._conditions[predicate_value] = struct
 
@@ -210,8 +451,8 @@ class BreadConditional(object):
             self._conditions[self._get_condition()].__setattr__(attr, value)
 
 
-    def as_native(self):
-        return self._conditions[self._get_condition()].as_native()
+    def as_native(self, memo=None):
+        return self._conditions[self._get_condition()].as_native(memo)
 
     def __str__(self):
         return '\n'.join(
@@ -236,6 +477,7 @@ def build_struct(spec, type_name=None):
         NewBreadStruct.__name__ = type_name
 
     struct = NewBreadStruct()
+    object.__setattr__(struct, '_spec', spec)
 
     global_options = {}
 
@@ -255,10 +497,15 @@ def build_struct(spec, type_name=None):
             else:
                 field = spec_line[0]
 
+            field = field(struct, **global_options)
+
+            if isinstance(field, BreadField) and field._fixed_length:
+                # Unnamed leaf fields can't be read, so they're skipped over
+                # like padding
+                field = _padding_field(field._length)
+
             # Don't give the field a name
-            struct._add_field(
-                field(struct, **global_options), '_unnamed_%d' %
-                (unnamed_fields))
+            struct._add_field(field, '_unnamed_%d' % (unnamed_fields))
             unnamed_fields += 1
 
         elif spec_line[0] == CONDITIONAL:
@@ -1,3 +1,13 @@
+import collections
+import importlib
+import os
+
+try:
+    _string_types = (basestring,)  # noqa: F821 (Python 2 only)
+except NameError:
+    _string_types = (str,)
+
+
 def indent_text(string, indent_level=2):
     """Indent every line of text in a newline-delimited string"""
     indented_lines = []
@@ -8,3 +18,135 @@ def indent_text(string, indent_level=2):
         indented_lines.append(indent_spaces + line)
 
     return '\n'.join(indented_lines)
+
+
+def _copy_spec(spec):
+    # Copies the lists, tuples and dicts that make up a spec, so that the
+    # copy doesn't change when the spec is changed in place
+    if isinstance(spec, list):
+        return [_copy_spec(item) for item in spec]
+    elif isinstance(spec, tuple):
+        return tuple(_copy_spec(item) for item in spec)
+    elif isinstance(spec, dict):
+        return dict((key, _copy_spec(item)) for key, item in spec.items())
+
+    return spec
+
+
+class _SpecCache(object):
+    """Values computed from specs, which are recomputed if a spec is changed
+    in place. At most `max_entries` values are kept; the oldest are discarded
+    first."""
+
+    def __init__(self, max_entries=256):
+        # Entries are keyed by the spec's id, and hold on to the spec (so that
+        # its id can't be reused while the entry is alive) and a copy of it
+        # as it was when the value was computed
+        self._entries = collections.OrderedDict()
+        self._max_entries = max_entries
+
+    def get(self, spec, extra_key, compute):
+        """Return compute() for `spec` and `extra_key` (any other hashable
+        value that the result depends on), computing it if it isn't cached"""
+        key = (id(spec), extra_key)
+        entry = self._entries.get(key)
+
+        if entry is not None and entry[0] is spec and entry[1] == spec:
+            return entry[2]
+
+        value = compute()
+
+        if key in self._entries:
+            del self._entries[key]
+        elif len(self._entries) >= self._max_entries:
+            self._entries.popitem(last=False)
+
+        self._entries[key] = (spec, _copy_spec(spec), value)
+
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _import_optional(module_name):
+    """Import and return a module, or return None if it isn't installed"""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        return None
+
+
+def _byte_view(buf):
+    """Return a memoryview of `buf` with one byte per item, without copying
+    it if possible"""
+    try:
+        view = memoryview(buf)
+    except TypeError:
+        # Python 2's mmaps don't support memoryviews, but writable ones can
+        # be viewed through ctypes; read-only ones have to be copied
+        import ctypes
+
+        try:
+            view = memoryview((ctypes.c_char * len(buf)).from_buffer(buf))
+        except TypeError:
+            view = memoryview(buf[:])
+
+    # memoryview.cast isn't available before Python 3.3, but Python 2's
+    # memoryviews of bytes-like objects already have one byte per item
+    if hasattr(view, 'cast'):
+        view = view.cast('B')
+
+    return view
+
+
+def _to_bytes(data):
+    """Return a bytes-like object's contents as bytes (bytes() of a memoryview
+    is its repr on Python 2)"""
+    if isinstance(data, memoryview):
+        return data.tobytes()
+
+    return bytes(data)
+
+
+def _release_view(view):
+    """Release a memoryview, if memoryviews can be released (they can't
+    before Python 3.2)"""
+    release = getattr(view, 'release', None)
+
+    if release is not None:
+        release()
+
+
+def _raw_bytes(data_bits, start, length):
+    """Return the `length` bits of `data_bits` starting at `start` as bytes
+    (padded with zeroes to a whole number of bytes), or as a memoryview if
+    they can be viewed without copying them"""
+    byte_view = getattr(data_bits, 'byte_view', None)
+
+    if byte_view is not None:
+        view = byte_view(start, start + length)
+
+        if view is not None:
+            return view
+
+    return data_bits[start:start + length].tobytes()
+
+
+def _pread(fd, length, offset):
+    if hasattr(os, 'pread'):
+        return os.pread(fd, length, offset)
+    else:   # pragma: no cover
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, length)
+
+
+def _pwrite(fd, data, offset):
+    if hasattr(os, 'pwrite'):
+        os.pwrite(fd, data, offset)
+    else:   # pragma: no cover
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
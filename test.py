@@ -1,15 +1,29 @@
 #!/usr/bin/env python
 
+import bz2
+import gzip
+import io
 import itertools
 import json
+import multiprocessing.pool
 import os
+import pickle
 import struct
+import subprocess
+import sys
 import tempfile
+import zlib
 
 import bitstring
 import bread as b
 import pytest
 
+try:
+    import lzma
+except ImportError:
+    # Python 2 doesn't have lzma
+    lzma = None
+
 # Shared structs for bread struct test
 
 test_struct = [
@@ -974,6 +988,37 @@ def test_array_eq():
     assert first_test_parsed.nums != first_test_parsed_copy.nums
 
 
+def test_array_eq_compares_values():
+    # Arrays of the same item spec, but with different options, are compared
+    # by value
+    little_spec = [{'endianness': b.LITTLE_ENDIAN},
+                   ('nums', b.array(1, b.uint16))]
+    big_spec = [{'endianness': b.BIG_ENDIAN}, ('nums', b.array(1, b.uint16))]
+
+    little = b.parse(bytearray([1, 0]), little_spec)
+    big = b.parse(bytearray([0, 1]), big_spec)
+
+    assert little.nums == big.nums
+    assert little.nums == [1]
+
+    # Enums with a default decode different bits to the same value
+    colors = b.enum(8, {0: 'red', 1: 'blue'}, default='other')
+    color_spec = [('colors', b.array(2, colors))]
+
+    first = b.parse(bytearray([1, 7]), color_spec)
+    second = b.parse(bytearray([1, 9]), color_spec)
+
+    assert first.colors == second.colors
+    assert first.colors != b.parse(bytearray([0, 9]), color_spec).colors
+
+    # ... as do enums with alternative encodings of a value
+    states = b.enum(8, {1: 'on', (2, 3): 'off'})
+    state_spec = [('states', b.array(2, states))]
+
+    assert (b.parse(bytearray([1, 2]), state_spec).states ==
+            b.parse(bytearray([1, 3]), state_spec).states)
+
+
 def test_printable_str():
     data = bytearray([42, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdb])
 
@@ -1125,3 +1170,1399 @@ def _test_new(data=None):
 
     output_bytes = b.write(empty_struct)
     assert output_bytes == bytearray([0x68, 0x65, 0x6c, 0x6c, 0x6f, 0xb0])
+
+
+def test_parse_projected_fields():
+    data = bitstring.BitArray(bytearray(range(34)))
+    data.append('0b0')
+
+    projected = b.parse(
+        data, deeply_nested_struct,
+        fields=['ubermatrix[*].last', 'dummy.length'])
+
+    assert len(projected) == 273
+
+    assert [x.last for x in projected.ubermatrix] == [10, 21, 32]
+    assert projected.dummy.length == 33
+
+    with pytest.raises(AttributeError):
+        projected.ubermatrix[0].first
+
+    with pytest.raises(AttributeError):
+        projected.dummy.ok
+
+    assert projected.as_native() == {
+        "ubermatrix": [{"last": 10}, {"last": 21}, {"last": 32}],
+        "dummy": {"length": 33}
+    }
+
+
+def test_parse_projected_fields_keeps_conditional_predicates():
+    true_data = bitstring.BitArray(bytearray([0b11001010, 0b11101000]))
+    true_data.append('0b0')
+
+    projected = b.parse(true_data, conditional_test, fields=['quxz'])
+
+    assert projected._length == 13
+    assert projected.quxz == 0b01011101
+    assert projected.qux
+
+    with pytest.raises(AttributeError):
+        projected.frooz
+
+
+def test_projection_cache():
+    spec = [("a", b.uint8), ("b", b.uint8)]
+
+    assert b.project(spec, ['b']) is b.project(spec, ['b'])
+
+    # Changing a spec in place changes its projection
+    spec.append(("c", b.uint8))
+    spec[1] = ("b", b.uint16)
+    spec.insert(0, {"endianness": b.BIG_ENDIAN})
+
+    projected = b.parse(bytearray([1, 2, 3, 4]), spec, fields=['b', 'c'])
+
+    assert projected.as_native() == {"b": 0x0203, "c": 4}
+
+    # Only so many projections are kept
+    for i in range(1000):
+        b.project([("x", b.uint8), ("y", b.uint8), ("z%d" % i, b.uint8)],
+                  ['y'])
+
+    assert len(b.projection._projection_cache) <= 256
+
+
+def test_project_bad_paths():
+    with pytest.raises(ValueError):
+        b.project(test_struct, ['nonexistent'])
+
+    with pytest.raises(ValueError):
+        b.project(deeply_nested_struct, ['dummy.nonexistent'])
+
+    with pytest.raises(ValueError):
+        b.project(deeply_nested_struct, ['ubermatrix[1].first'])
+
+    with pytest.raises(ValueError):
+        b.project(test_struct, ['first.nonexistent'])
+
+
+def test_scan_fixed_length_records():
+    records = [
+        struct.pack(">IqQb", 0xafb0dddd, -57, 90, 0),
+        struct.pack(">IqQb", 0x1de0fafe, 24, 999999, 1),
+        struct.pack(">IqQb", 0xafb3dddd, 12, 90, 2),
+    ]
+    data = b''.join(records)
+
+    matches = list(b.scan(data, test_struct, where={"third": 90}))
+
+    assert [x.fourth for x in matches] == [0, 2]
+    assert matches[1].second == 12
+
+    assert list(b.scan(
+        data, test_struct, where={"flag_one": True, "fourth": 2},
+        offsets=True)) == [42]
+
+    assert list(b.scan(
+        data, test_struct, where={"second": lambda x: x > 0},
+        offsets=True)) == [21, 42]
+
+    assert list(b.scan(
+        data, test_struct, where={"first": 0xde, "third": 90})) == []
+
+    assert [x.fourth for x in b.iter_parse(data, test_struct)] == [0, 1, 2]
+
+    with pytest.raises(ValueError):
+        list(b.scan(data, test_struct, where={"nonexistent": 1}))
+
+    with pytest.raises(ValueError):
+        list(b.scan(data[:-1], test_struct))
+
+
+def test_scan_variable_length_records():
+    instrument = [
+        ("instrument_type", b.enum(8, {
+            0: 'pulse',
+            1: 'wave'
+        })),
+        (b.CONDITIONAL, "instrument_type", {
+            "pulse": [("envelope", b.byte)],
+            "wave": [("volume", b.byte), ("synth", b.byte)]
+        })
+    ]
+
+    data = bytearray([0, 0xa8, 1, 3, 4, 0, 0xb2, 1, 5, 6])
+
+    waves = list(b.scan(data, instrument, where={"instrument_type": 'wave'}))
+
+    assert [(x.volume, x.synth) for x in waves] == [(3, 4), (5, 6)]
+
+    assert list(b.scan(
+        io.BytesIO(data), instrument, where={"instrument_type": 'pulse'},
+        offsets=True)) == [0, 5]
+
+    with pytest.raises(ValueError):
+        list(b.scan(data[:-1], instrument))
+
+
+def test_record_index():
+    instrument = [
+        {"endianness": b.BIG_ENDIAN},
+        ("id", b.uint16),
+        ("instrument_type", b.enum(8, {
+            0: 'pulse',
+            1: 'wave'
+        })),
+        (b.CONDITIONAL, "instrument_type", {
+            "pulse": [("envelope", b.byte)],
+            "wave": [("volume", b.byte), ("synth", b.byte)]
+        })
+    ]
+
+    data = bytearray([
+        0, 7, 0, 0xa8,
+        0, 3, 1, 3, 4,
+        0, 5, 0, 0xb2,
+        0, 1, 1, 5, 6])
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'instruments.bin')
+
+    with open(path, 'wb') as fp:
+        fp.write(data)
+
+    with b.build_index(path, instrument, key='id') as index:
+        assert len(index) == 4
+        assert [index.offset(i) for i in range(4)] == [0, 4, 9, 13]
+        assert index.get(2).envelope == 0xb2
+
+    with b.load_index(path, instrument) as index:
+        assert index.key == 'id'
+        assert index.get(3).volume == 5
+        assert index.lookup(3).synth == 4
+        assert index.lookup(5).envelope == 0xb2
+
+        with pytest.raises(KeyError):
+            index.lookup(2)
+
+        with pytest.raises(IndexError):
+            index.get(4)
+
+    with b.build_index(path, instrument) as index:
+        with pytest.raises(ValueError):
+            index.lookup(3)
+
+    # Keys are stored with a fixed width, so keys whose width varies can't
+    # be indexed
+    named = [("name", b.cstring(8)), ("value", b.uint8)]
+    named_path = os.path.join(tmpdir, 'named.bin')
+
+    with open(named_path, 'wb') as fp:
+        fp.write(b'ab\0\x01xyzw\0\x02c\0\x03')
+
+    with pytest.raises(ValueError):
+        b.build_index(named_path, named, key='name')
+
+    with b.build_index(named_path, named, key='value') as index:
+        assert index.lookup(2).name == 'xyzw'
+
+
+def test_record_index_fixed_length_records():
+    data = b''.join(
+        struct.pack(">IqQb", 0xafb0dddd, -i, 100 - i, i) for i in range(5))
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'records.bin')
+    index_path = os.path.join(tmpdir, 'records.index')
+
+    with open(path, 'wb') as fp:
+        fp.write(data)
+
+    b.build_index(path, test_struct, key='third', index_path=index_path)
+
+    with b.load_index(path, test_struct, index_path=index_path) as index:
+        assert index.get(3).second == -3
+        assert index.lookup(98).fourth == 2
+
+        with pytest.raises(KeyError):
+            index.lookup(1000)
+
+
+def test_to_columns():
+    numpy = pytest.importorskip('numpy')
+
+    record_spec = [
+        ("name", b.string(3)),
+        ("kind", b.enum(4, {
+            0: 'pulse',
+            (1, 2): 'wave'
+        }, default='other')),
+        ("volume", b.nibble),
+        ("level", b.int16),
+        ("offset_level", b.uint8, {"offset": 1}),
+        ("bigend", b.uint16, {"endianness": b.BIG_ENDIAN}),
+        ("ok", b.boolean),
+        b.padding(7)
+    ]
+
+    data = bytearray(
+        b'foo' + bytearray([0x1a, 0xfe, 0xff, 7, 1, 2, 0x80]) +
+        b'ba\x00' + bytearray([0x2b, 3, 0, 0, 3, 4, 0]) +
+        b'qux' + bytearray([0xf0, 0, 0x80, 255, 0, 0, 0x80]))
+
+    records = list(b.iter_parse(data, record_spec))
+    expected = [x.as_native() for x in records]
+
+    for source in (data, records):
+        columns = b.to_columns(source, record_spec)
+
+        assert sorted(columns.keys()) == sorted(expected[0].keys())
+
+        assert list(columns['name']) == [b'foo', b'ba', b'qux']
+
+        assert columns['volume'].tolist() == [x['volume'] for x in expected]
+        assert columns['level'].tolist() == [x['level'] for x in expected]
+        assert columns['offset_level'].tolist() == [
+            x['offset_level'] for x in expected]
+        assert columns['bigend'].tolist() == [x['bigend'] for x in expected]
+        assert columns['ok'].dtype == numpy.bool_
+        assert columns['ok'].tolist() == [True, False, True]
+
+        categories = columns.categories['kind']
+        assert [categories[i] for i in columns['kind']] == [
+            'wave', 'wave', 'other']
+
+
+def test_to_columns_nested():
+    pytest.importorskip('numpy')
+
+    data = bytearray([42, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdb]) * 2
+
+    columns = b.to_columns(io.BytesIO(data), nested_array_struct)
+
+    assert columns['first'].tolist() == [42, 42]
+    assert columns['matrix[1][2]'].tolist() == [5, 5]
+
+    with pytest.raises(ValueError):
+        b.to_columns(data, conditional_test)
+
+
+def test_pickle_registered_struct():
+    spec = b.register_spec('test_pickle_nested_array_struct', [
+        {"endianness": b.BIG_ENDIAN},
+        ("first", b.uint8),
+        ("matrix", b.array(3, b.array(3, b.uint8))),
+        ("last", b.uint16)
+    ])
+
+    data = bytearray([42, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdb, 0xdc])
+
+    parsed = b.parse(data, spec, type_name='matrix_struct')
+    parsed.matrix[1][1] = 99
+
+    pickled = pickle.dumps(parsed, pickle.HIGHEST_PROTOCOL)
+
+    # Only the spec's name, the type name and the data are pickled, not the
+    # struct's fields
+    assert len(pickled) < (len(data) + len('test_pickle_nested_array_struct') +
+                           len('matrix_struct') + 100)
+
+    unpickled = pickle.loads(pickled)
+
+    assert type(unpickled).__name__ == 'matrix_struct'
+    assert unpickled == parsed
+    assert unpickled.matrix[1][1] == 99
+    assert unpickled.last == 0xdbdc
+
+    assert b.registered_spec('test_pickle_nested_array_struct') is spec
+
+    with pytest.raises(ValueError):
+        b.register_spec('test_pickle_nested_array_struct', simple_struct)
+
+
+def test_pickle_unregistered_struct_fails():
+    parsed = b.parse(bytearray([1, 0x80]), simple_struct)
+
+    with pytest.raises(pickle.PicklingError):
+        pickle.dumps(parsed)
+
+
+def test_parse_memoryview_in_place():
+    data = bytearray([42, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdb])
+
+    parsed = b.parse(memoryview(data), nested_array_struct)
+
+    assert parsed.matrix[2][1] == 7
+    assert parsed.last == 0xdb
+
+    parsed.matrix[2][1] = 77
+    parsed.first = 0x0f
+
+    assert data == bytearray([0x0f, 0, 1, 2, 3, 4, 5, 6, 77, 8, 0xdb])
+    assert b.write(parsed) == data
+
+    sub_byte = bytearray([0b10110010])
+    parsed = b.parse(memoryview(sub_byte), [
+        ("bit_0", b.bit),
+        ("bit_1", b.bit),
+        ("semi_nibble", b.semi_nibble),
+        ("nibble", b.nibble)])
+
+    parsed.semi_nibble = 0b01
+    assert sub_byte == bytearray([0b10010010])
+
+    read_only = b.parse(memoryview(bytes(data)), nested_array_struct)
+
+    with pytest.raises(ValueError):
+        read_only.first = 1
+
+
+def _item_total(item):
+    return item.first + sum(sum(row) for row in item.matrix) + item.last
+
+
+def test_map_array_over_shared_memory():
+    shared_memory = pytest.importorskip('multiprocessing.shared_memory')
+
+    spec = b.register_spec('test_map_array_spec', [
+        ("count", b.uint8),
+        ("items", b.array(6, nested_array_struct))
+    ])
+
+    data = bytearray([6]) + bytearray(range(66))
+
+    block = shared_memory.SharedMemory(create=True, size=len(data))
+
+    try:
+        block.buf[:len(data)] = data
+
+        parsed = b.parse(block, spec)
+
+        assert parsed._data_bits.shared_memory_name == block.name
+
+        totals = b.map_array(parsed, 'items', _item_total, processes=2)
+
+        assert totals == [sum(range(i * 11, (i + 1) * 11)) for i in range(6)]
+
+        with pytest.raises(ValueError):
+            b.map_array(b.parse(data, spec), 'items', _item_total)
+
+        parsed._data_bits.release()
+        del parsed
+    finally:
+        block.close()
+        block.unlink()
+
+
+def test_profile():
+    data = bytearray([42, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdb])
+
+    with b.profile(nested_array_struct) as profile:
+        parsed = b.parse(data, nested_array_struct)
+        unprofiled = b.parse(data, simple_struct)
+
+        assert parsed.first == 42
+        assert parsed.first == 42
+        assert parsed.matrix[1][2] == 5
+        parsed.last = 7
+        assert unprofiled.length == 42
+
+    stats = profile.as_dict()
+
+    assert sorted(stats.keys()) == ['first', 'last', 'matrix[*][*]']
+
+    assert stats['first']['decodes'] == 1
+    assert stats['first']['cache_misses'] == 1
+    assert stats['first']['cache_hits'] == 1
+    assert stats['matrix[*][*]']['decodes'] == 1
+    assert stats['last']['encodes'] == 1
+    assert stats['last']['bit_allocations'] == 1
+    assert stats['last']['decodes'] == 0
+
+    assert 'matrix[*][*]' in profile.table()
+
+    # Fields aren't instrumented once profiling is done
+    assert parsed.matrix[2][2] == 8
+    assert profile.as_dict()['matrix[*][*]']['decodes'] == 1
+
+    assert stats['first']['bit_allocations'] == 1
+
+    # Strings that are decoded straight from a buffer don't allocate
+    # bitstrings
+    spec = [("name", b.string(4)), ("flag", b.boolean), b.padding(7)]
+
+    with b.profile(spec) as profile:
+        parsed = b.parse(memoryview(bytearray(b'abcd\x80')), spec)
+
+        assert parsed.name == 'abcd'
+        assert parsed.flag
+
+    stats = profile.as_dict()
+
+    assert stats['name']['decodes'] == 1
+    assert stats['name']['bit_allocations'] == 0
+    assert stats['flag']['bit_allocations'] == 1
+
+
+def test_frozen_struct():
+    data = bytearray(range(34)) + bytearray([0x80])
+
+    frozen = b.parse(data, as_native_struct, frozen=True)
+
+    assert frozen._frozen
+    assert frozen._data_bits.read_only
+
+    with pytest.raises(ValueError):
+        frozen.dummy.length = 4
+
+    with pytest.raises(ValueError):
+        frozen.ubermatrix[0].matrix[1][1] = 4
+
+    # The frozen struct has its own copy of the data
+    data[0] = 99
+    assert frozen.ubermatrix[0].first == 0
+
+    expected = b.parse(data, as_native_struct).as_native()
+    expected['ubermatrix'][0]['first'] = 0
+
+    def read_everything(_):
+        return frozen.as_native()
+
+    pool = multiprocessing.pool.ThreadPool(8)
+
+    try:
+        results = pool.map(read_everything, range(32))
+    finally:
+        pool.close()
+
+    assert all(result == expected for result in results)
+
+
+def test_parse_eager():
+    data = bitstring.BitArray(bytearray(range(34)))
+    data.append('0b0')
+
+    record = b.parse(data, deeply_nested_struct, type_name='supernested',
+                     eager=True)
+
+    assert type(record).__name__ == 'supernested'
+    assert isinstance(record, tuple)
+    assert record.dummy.length == 33
+    assert not record.dummy.ok
+    assert record.ubermatrix[1].first == 11
+    assert record.ubermatrix[2].matrix == [[23, 24, 25], [26, 27, 28],
+                                           [29, 30, 31]]
+    assert record._asdict()['ubermatrix'][0]._asdict() == {
+        "first": 0,
+        "matrix": [[1, 2, 3], [4, 5, 6], [7, 8, 9]],
+        "last": 10
+    }
+
+    with pytest.raises(AttributeError):
+        record.dummy.length = 4
+
+    another = b.parse(data, deeply_nested_struct, type_name='supernested',
+                      eager=True)
+    assert type(another) is type(record)
+    assert another == record
+
+
+def test_parse_eager_bytes():
+    spec = [
+        {'endianness': b.LITTLE_ENDIAN},
+        ('class', b.uint16),
+        ('names', b.array(2, b.string(3))),
+        ('points', b.array(2, [('x', b.int8), ('y', b.int8)])),
+        ('flag', b.boolean),
+        ('padding', b.padding(7))]
+
+    data = bytearray([0x34, 0x12]) + bytearray(b'abcdef') + bytearray(
+        [1, 0xfe, 3, 4, 0x80])
+
+    record = b.parse(data, spec, type_name='rec', eager=True)
+
+    assert record._fields == ('_0', 'names', 'points', 'flag')
+    assert record._0 == 0x1234
+    assert record.names == ['abc', 'def']
+    assert record.points[1].x == 3
+    assert record.points[0].y == -2
+    assert record.flag
+
+    # The bytearray isn't left exported by the parse
+    data.append(0)
+
+    lazy = b.decode_eagerly(b.parse(bytes(data), spec, type_name='rec'))
+    assert lazy == record
+
+    with pytest.raises(ValueError):
+        b.parse(bytes(data[:5]), spec, eager=True)
+
+
+def test_parse_eager_spec_changes():
+    spec = [("a", b.uint8)]
+
+    assert b.parse(bytearray([1, 2]), spec, eager=True)._asdict() == {"a": 1}
+
+    # Changing a spec in place changes how it's decoded
+    spec.append(("c", b.uint8))
+
+    assert b.parse(bytearray([1, 2]), spec, eager=True)._asdict() == {
+        "a": 1, "c": 2}
+
+    # Only so many plans are kept
+    for i in range(1000):
+        b.parse(bytearray([1, 2]), [("x", b.uint8), ("y%d" % i, b.uint8)],
+                eager=True)
+
+    assert len(b.eager._decode_plans) <= 256
+
+
+def test_parse_eager_conditional():
+    true_data = bitstring.BitArray(bytearray([0b11001010, 0b11101000]))
+    true_data.append('0b0')
+
+    record = b.parse(true_data, conditional_test, eager=True)
+
+    assert record._fields == ('qux', 'frooz', 'quxz')
+    assert record.qux
+    assert record.frooz == 0b1001
+    assert record.quxz == 0b01011101
+
+
+def test_rebind():
+    data = struct.pack(">IqQb", 0xafb0dddd, -57, 90, 0)
+    data2 = struct.pack(">IqQb", 0x1de0fafe, 24, 999999, 1)
+
+    parsed = b.parse(data, test_struct)
+    first_field = parsed._fields['first']
+
+    assert parsed.first == 0xfb
+    assert parsed.second == -57
+
+    assert parsed.rebind(data2) is parsed
+
+    assert parsed._fields['first'] is first_field
+    assert parsed.first == 0xde
+    assert parsed.second == 24
+    assert b.write(parsed) == data2
+
+    with pytest.raises(ValueError):
+        parsed.rebind(data2[:-2])
+
+
+def test_rebind_conditional():
+    true_data = bitstring.BitArray(bytearray([0b11001010, 0b11101000]))
+    true_data.append('0b0')
+
+    false_data = bitstring.BitArray(
+        bytearray([0b01001000, 0b10000000]))
+    false_data.append('0b1')
+
+    parsed = b.parse(true_data, conditional_test)
+
+    assert parsed.frooz == 0b1001
+    assert parsed._length == 13
+
+    parsed.rebind(false_data)
+
+    assert not parsed.qux
+    assert parsed.fooz == 0b10010001
+    assert parsed.barz == 1
+    assert parsed._length == 17
+
+    frozen = b.parse(true_data, conditional_test, frozen=True)
+    frozen.rebind(false_data)
+
+    assert frozen.fooz == 0b10010001
+
+    with pytest.raises(ValueError):
+        frozen.fooz = 1
+
+
+def test_rebind_conditional_array():
+    spec = [
+        ("items", b.array(2, [
+            ("kind", b.uint8),
+            (b.CONDITIONAL, "kind", {
+                0: [("small", b.uint8)],
+                1: [("large", b.uint16)]
+            })
+        ])),
+        ("last", b.uint8)
+    ]
+
+    parsed = b.parse(bytearray([0, 1, 1, 5, 0, 9]), spec)
+
+    assert parsed.items._length == 40
+    assert parsed.last == 9
+    assert b.write(parsed) == bytearray([0, 1, 1, 5, 0, 9])
+
+    # The array's length is found again when its data changes
+    parsed.rebind(bytearray([1, 6, 0, 0, 7, 8]))
+
+    assert parsed.items._length == 40
+    assert parsed.items[1].small == 7
+    assert parsed.last == 8
+
+    parsed.rebind(bytearray([0, 6, 0, 7, 8]))
+
+    assert parsed.items._length == 32
+    assert parsed.last == 8
+    assert len(parsed) == 40
+
+
+def test_batch():
+    data = struct.pack(">IqQb", 0xafb0dddd, -57, 90, 0)
+    parsed = b.parse(data, test_struct)
+
+    with parsed.batch():
+        parsed.second = 42
+        parsed.third = 1234
+        parsed.flag_one = False
+
+        # Writes are buffered until the batch ends
+        assert parsed._data_bits._data_bits.tobytes() == data
+
+        assert parsed.second == 42
+        assert parsed.third == 1234
+
+    assert parsed._data_bits.dirty_ranges() == [(0, 1), (4, 20)]
+
+    expected = struct.pack(">IqQb", 0x2fb0dddd, 42, 1234, 0)
+    assert b.write(parsed) == expected
+
+    # Reads of changed bits see the changes before the batch ends
+    with parsed.batch():
+        parsed.blah = 7
+        assert parsed._data_bits[16:32].uint == 7
+
+    assert parsed.blah == 7
+
+
+def test_write_changes():
+    data = struct.pack(">IqQb", 0xafb0dddd, -57, 90, 0)
+    parsed = b.parse(data, test_struct)
+    fp = io.BytesIO(data + b'trailer')
+
+    assert b.write_changes(parsed, fp) == []
+
+    with parsed.batch():
+        parsed.fourth = -1
+        parsed.first = 0x12
+
+    assert b.write_changes(parsed, fp) == [(0, 2), (20, 21)]
+    assert fp.getvalue() == b.write(parsed) + b'trailer'
+
+    # Ranges are only written once
+    assert b.write_changes(parsed, fp) == []
+
+    frozen = b.parse(data, test_struct, frozen=True)
+
+    with pytest.raises(ValueError):
+        with frozen.batch():
+            pass
+
+
+def test_patch():
+    data = struct.pack(">IqQb", 0xafb0dddd, -57, 90, 0)
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'patched.bin')
+
+    with open(path, 'wb') as fp:
+        fp.write(data)
+
+    # flag_one and first share a byte; second and third are adjacent
+    b.patch(path, test_struct, {
+        'flag_one': False, 'first': 0x12, 'second': 42, 'third': 1234})
+
+    with open(path, 'rb') as fp:
+        assert fp.read() == struct.pack(">IqQb", 0x2120dddd, 42, 1234, 0)
+
+    with pytest.raises(ValueError):
+        b.patch(path, test_struct, {'nonexistent': 1})
+
+    with pytest.raises(ValueError):
+        b.patch(path, test_struct, {'flags': 1})
+
+
+def test_patch_large_array():
+    spec = [
+        ("count", b.uint32),
+        ("items", b.array(1 << 20, [("volume", b.uint8),
+                                    ("pitch", b.uint8)]))]
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'patched.bin')
+
+    with open(path, 'wb') as fp:
+        fp.write(bytearray(4 + 2 * (1 << 20)))
+
+    # Only the changed items are found, instead of laying out every item
+    b.patch(path, spec, {'items[900000].pitch': 7, 'items[42].volume': 3})
+
+    with open(path, 'rb') as fp:
+        fp.seek(4 + 2 * 42)
+        assert fp.read(2) == b'\x03\x00'
+
+        fp.seek(4 + 2 * 900000)
+        assert fp.read(2) == b'\x00\x07'
+
+    with pytest.raises(ValueError):
+        b.patch(path, spec, {'items[1048576].volume': 1})
+
+
+def test_patch_conditional():
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'patched.bin')
+
+    with open(path, 'wb') as fp:
+        fp.write(bytearray([0b01001000, 0b10000000, 0b10000000]))
+
+    b.patch(path, conditional_test, {'fooz': 0xff})
+
+    with open(path, 'rb') as fp:
+        parsed = b.parse(fp.read(), conditional_test)
+
+    assert parsed.fooz == 0xff
+    assert parsed.barz == 1
+
+    with pytest.raises(ValueError):
+        b.patch(path, conditional_test, {'frooz': 1})
+
+
+def test_substruct_eq_and_hash():
+    data = bytearray([42, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdb] +
+                     [43, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdc] +
+                     [42, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdb] + [0, 0])
+
+    parsed = b.parse(data, deeply_nested_struct)
+
+    # Only the substructs' own bits are compared
+    assert parsed.ubermatrix[0] == parsed.ubermatrix[2]
+    assert parsed.ubermatrix[0] != parsed.ubermatrix[1]
+    assert parsed.ubermatrix[0].matrix == parsed.ubermatrix[1].matrix
+    assert parsed.ubermatrix[0] != parsed.dummy
+
+    with pytest.raises(TypeError):
+        hash(parsed)
+
+    frozen = b.parse(data, deeply_nested_struct, frozen=True)
+    items = [frozen.ubermatrix[i] for i in range(3)]
+
+    assert len(set(items)) == 2
+    assert hash(items[0]) == hash(items[2])
+    assert items[0] == parsed.ubermatrix[0]
+
+
+def test_as_native_memo():
+    data = bytearray([42, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdb] +
+                     [43, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdc] +
+                     [42, 0, 1, 2, 3, 4, 5, 6, 7, 8, 0xdb] + [0, 0])
+
+    parsed = b.parse(data, deeply_nested_struct)
+    memo = b.DecodeMemo()
+
+    native = parsed.as_native(memo=memo)
+
+    assert native == parsed.as_native()
+    assert native['ubermatrix'][0] is native['ubermatrix'][2]
+    assert memo.hits == 1
+    assert memo.misses == 4
+    assert memo.hit_rate == 0.2
+
+    # Results are shared between parses
+    assert b.parse(data, deeply_nested_struct).as_native(memo=memo) is native
+
+    small_memo = b.DecodeMemo(max_entries=1)
+    parsed.as_native(memo=small_memo)
+
+    assert len(small_memo) == 1
+    assert small_memo.hits == 0
+
+    small_memo.clear()
+    assert len(small_memo) == 0
+
+
+def test_array_as_numpy():
+    pytest.importorskip('numpy')
+
+    suits = b.enum(4, {0: 'diamonds', 1: 'hearts', (2, 3): 'spades'})
+
+    spec = [
+        ("suits", b.array(6, suits)),
+        ("nums", b.array(3, b.int16), {"endianness": b.LITTLE_ENDIAN}),
+        ("flags", b.array(4, b.boolean)),
+        ("ranks", b.array(2, b.enum(8, {1: 'ace', 13: 'king'},
+                                    default='other'))),
+        b.padding(4)
+    ]
+
+    data = bytearray([0x01, 0x23, 0x10, 0x10, 0xff, 0xff, 0x02, 0x00, 0x03,
+                      0xa0, 0xd0, 0x20])
+    parsed = b.parse(data, spec)
+
+    suits_array = parsed.suits.as_numpy()
+
+    assert list(suits_array) == parsed.suits[:]
+    assert list(suits_array) == [
+        'diamonds', 'hearts', 'spades', 'spades', 'hearts', 'diamonds']
+
+    assert list(parsed.nums.as_numpy()) == [-240, 767, 768]
+    assert list(parsed.flags.as_numpy()) == [True, False, True, False]
+    assert list(parsed.ranks.as_numpy()) == ['king', 'other']
+
+    parsed._data_bits.overwrite(bitstring.Bits(uint=9, length=4), 4)
+
+    with pytest.raises(ValueError):
+        parsed.suits.as_numpy()
+
+
+def test_str_options():
+    str_test = [
+        ("name", b.string(8, nul_padded=True)),
+        ("raw_name", b.string(4, raw=True, nul_padded=True)),
+        ("names", b.array(3, b.string(2)))
+    ]
+
+    data = bytearray(b'lsdj\0\0\0\0ab\0\0c\0dee\0')
+
+    for source in (data, memoryview(data)):
+        parsed = b.parse(source, str_test)
+
+        assert parsed.name == 'lsdj'
+        assert parsed.raw_name == b'ab'
+
+        parsed.name = 'song'
+        parsed.raw_name = b'xyz'
+
+        assert b.write(parsed)[:8] == b'song\0\0\0\0'
+        assert parsed.raw_name == b'xyz'
+
+        with pytest.raises(ValueError):
+            parsed.name = 'much too long'
+
+        assert parsed.names == ['c\0', 'de', 'e\0']
+
+    assert memoryview(data)[:4] == b'song'
+
+
+def test_str_array_as_numpy():
+    pytest.importorskip('numpy')
+
+    spec = [("names", b.array(3, b.string(2)))]
+
+    data = bytearray(b'c\0dee\0')
+
+    for source in (data, memoryview(data)):
+        parsed = b.parse(source, spec)
+
+        assert list(parsed.names.as_numpy()) == [b'c', b'de', b'e']
+
+
+def test_cstring():
+    spec = [
+        ("name", b.cstring(8)),
+        ("artist", b.cstring(8)),
+        ("year", b.uint8)
+    ]
+
+    data = bytearray(b'lsdj\0me\0\x07')
+
+    for source in (data, memoryview(data)):
+        parsed = b.parse(source, spec)
+
+        assert parsed.name == 'lsdj'
+        assert parsed.artist == 'me'
+        assert parsed.year == 7
+        assert len(parsed) == 9 * 8
+
+        parsed.artist = 'us'
+        assert b.write(parsed) == b'lsdj\0us\0\x07'
+
+        with pytest.raises(ValueError):
+            parsed.artist = 'them'
+
+    assert b.new(spec).as_native() == {'name': '', 'artist': '', 'year': 0}
+
+    with pytest.raises(ValueError):
+        b.parse(b'much too long\0\0\0', spec)
+
+    assert b.compile_layout(spec) is None
+
+
+def test_array_length_from_field():
+    spec = [
+        ("num_notes", b.uint8),
+        ("notes", b.array("num_notes", b.uint8)),
+        ("num_names", b.uint8),
+        ("names", b.array("num_names", [("name", b.cstring(4))])),
+        ("end", b.uint8)
+    ]
+
+    data = bytearray([3, 10, 20, 30, 2]) + b'ab\0c\0' + bytearray([0xff])
+    parsed = b.parse(data, spec)
+
+    assert parsed.notes == [10, 20, 30]
+    assert [x.name for x in parsed.names] == ['ab', 'c']
+    assert parsed.end == 0xff
+    assert len(parsed) == len(data) * 8
+
+    projected = b.parse(data, spec, fields=['notes', 'end'])
+
+    assert projected.notes == [10, 20, 30]
+    assert projected.end == 0xff
+
+    empty = b.parse(bytearray([0, 0, 0xaa]), spec)
+
+    assert empty.notes == []
+    assert empty.end == 0xaa
+
+    # The number of items can't be changed in place
+    with pytest.raises(ValueError):
+        parsed.num_notes = 4
+
+    parsed.num_notes = 3
+    assert parsed.end == 0xff
+
+    # Structs can be rebound to data with fewer items
+    parsed.rebind(bytearray([1, 7, 0, 0x55]))
+
+    assert parsed.notes == [7]
+    assert parsed.names == []
+    assert parsed.end == 0x55
+
+    tail_spec = [
+        ("n", b.uint8),
+        ("items", b.array("n", b.uint8)),
+        ("tail", b.uint8)
+    ]
+
+    tail = b.parse(bytearray([2, 7, 8, 55]), tail_spec)
+
+    with pytest.raises(ValueError):
+        tail.n = 3
+
+    assert len(tail) == 32
+
+    tail.rebind(bytearray([1, 7, 55]))
+
+    assert tail.items == [7]
+    assert tail.tail == 55
+    assert len(tail) == 24
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'counted.bin')
+
+    with open(path, 'wb') as fp:
+        fp.write(bytearray([2, 7, 8, 55]))
+
+    with pytest.raises(ValueError):
+        b.patch(path, tail_spec, {'n': 3})
+
+    b.patch(path, tail_spec, {'items[1]': 9, 'tail': 56})
+
+    with open(path, 'rb') as fp:
+        assert fp.read() == bytes(bytearray([2, 7, 9, 56]))
+
+
+def test_padding_is_shared():
+    spec = [
+        b.padding(4),
+        ("x", b.nibble),
+        (b.uint8,),
+        ("y", b.uint8),
+        ("pad", b.padding(4))
+    ]
+
+    data = bytearray([0xab, 0xcd, 0xef, 0x10])
+    first = b.parse(data, spec)
+    second = b.parse(data, spec)
+
+    assert first._offset == 0
+    assert first.x == 0xb
+    assert first.y == 0xef
+    assert first.pad is None
+    assert first.as_native() == {'x': 0xb, 'y': 0xef}
+
+    # Padding and unnamed fields don't refer to any particular struct's data
+    paddings = [field for field in first._field_list + second._field_list
+                if isinstance(field, b.BreadPadding)]
+
+    assert len(paddings) == 6
+    assert len(set(map(id, paddings))) == 2
+
+    with pytest.raises(ValueError):
+        first.pad = 3
+
+    assert b.write(first) == data
+
+
+def test_field_memory():
+    tracemalloc = pytest.importorskip('tracemalloc')
+
+    spec = [("values", b.array(256, b.uint8)),
+            ("suits", b.array(256, b.enum(8, {0: 'hearts'})))]
+    data = bytes(512)
+
+    # Parse and read once so that anything created the first time a spec is
+    # parsed isn't counted
+    first = b.parse(data, spec)
+    first.values[:]
+    first.suits[:]
+
+    tracemalloc.start()
+
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        parsed = b.parse(data, spec)
+
+        # Array items are only created when they're read
+        parsed.values[:]
+        parsed.suits[:]
+
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    # Fields share their encode and decode functions and have no __dict__
+    # (with a __dict__, each field takes at least 239 bytes)
+    assert (after - before) / 512.0 < 224
+    assert not hasattr(parsed.values._get_accessor_item(0), '__dict__')
+
+
+def test_scan_wide_enums():
+    def kind_spec(endianness):
+        return [
+            ("kind", b.enum(16, {(1, 3): 'wave', 2: 'pulse'},
+                            default='other'), {"endianness": endianness}),
+            ("volume", b.uint8)]
+
+    kinds = [1, 5, 2, 0x100, 3]
+
+    for endianness, fmt in ((b.LITTLE_ENDIAN, '<HB'), (b.BIG_ENDIAN, '>HB')):
+        spec = kind_spec(endianness)
+        data = b''.join(struct.pack(fmt, kind, i)
+                        for i, kind in enumerate(kinds))
+
+        # Records match whichever encoding their value has, including
+        # alternatives and values that decode to the default
+        assert list(b.scan(data, spec, where={'kind': 'other'},
+                           offsets=True)) == [3, 9]
+        assert list(b.scan(data, spec, where={'kind': 'wave'},
+                           offsets=True)) == [0, 12]
+        assert list(b.scan(data, spec, where={'kind': lambda k: k != 'wave'},
+                           offsets=True)) == [3, 6, 9]
+
+
+def test_scan_field_missing_from_conditional():
+    instrument = [
+        ("instrument_type", b.uint8),
+        (b.CONDITIONAL, "instrument_type", {
+            0: [("envelope", b.byte)],
+            1: [("volume", b.byte), ("synth", b.byte)]
+        })
+    ]
+
+    data = bytes(bytearray([0, 0xa8, 1, 3, 4, 0, 0xb2, 1, 5, 6]))
+
+    # Records whose conditionals don't include a field don't match
+    assert list(b.scan(data, instrument, where={'volume': 5},
+                       offsets=True)) == [7]
+    assert list(b.scan(io.BytesIO(data), instrument,
+                       where={'volume': lambda v: v > 0},
+                       offsets=True)) == [2, 7]
+
+
+def gzip_compress(data):
+    # gzip.compress isn't available on Python 2
+    buf = io.BytesIO()
+
+    with gzip.GzipFile(fileobj=buf, mode='wb') as fp:
+        fp.write(data)
+
+    return buf.getvalue()
+
+
+def test_scan_compressed(monkeypatch):
+    # Read a few bytes at a time, so that records span chunks
+    monkeypatch.setattr(b.compression, '_CHUNK_BYTES', 5)
+
+    records = [struct.pack(">IqQb", 0xafb0dddd, -i, 90 + i % 2, i)
+               for i in range(10)]
+    data = b''.join(records)
+
+    compressed_data = [gzip_compress(data), bz2.compress(data),
+                       gzip_compress(data[:42]) + gzip_compress(data[42:])]
+
+    if lzma is not None:
+        compressed_data.append(lzma.compress(data))
+
+    for compressed in compressed_data:
+        assert [x.fourth for x in b.iter_parse(compressed, test_struct)] == \
+            list(range(10))
+
+        assert list(b.scan(io.BytesIO(compressed), test_struct,
+                           where={"third": 91}, offsets=True)) == \
+            [21 * i for i in range(1, 10, 2)]
+
+    with pytest.raises(ValueError):
+        list(b.iter_parse(gzip_compress(data[:-1]), test_struct))
+
+    # Compression can be given explicitly, or turned off
+    assert len(list(b.iter_parse(
+        io.BytesIO(bz2.compress(data)), test_struct, compression='bz2'))) == 10
+    assert len(list(b.iter_parse(
+        io.BytesIO(data), test_struct, compression=None))) == 10
+
+
+def test_scan_looks_compressed():
+    # Uncompressed data that starts with a format's magic bytes is scanned
+    # as it is
+    spec = [{"endianness": b.BIG_ENDIAN}, ("id", b.uint16), ("value", b.byte)]
+
+    for first_id, first_value in ((0x1f8b, 1), (0x425a, ord('h'))):
+        data = struct.pack(">HBHB", first_id, first_value, 7, 2)
+
+        assert [(x.id, x.value) for x in b.iter_parse(data, spec)] == \
+            [(first_id, first_value), (7, 2)]
+        assert list(b.scan(bytearray(data), spec, where={"value": 2},
+                           offsets=True)) == [3]
+        assert b''.join(
+            bytes(chunk) for chunk in b.stream_chunks(data)) == data
+
+        # ... whether it's in memory or read from a file
+        assert [(x.id, x.value) for x in b.iter_parse(
+            io.BytesIO(data), spec)] == [(first_id, first_value), (7, 2)]
+
+    # Compression can still be given explicitly
+    with pytest.raises(zlib.error):
+        list(b.iter_parse(struct.pack(">HBHB", 0x1f8b, 1, 7, 2), spec,
+                          compression='gzip'))
+
+
+def test_decompression_is_bounded(monkeypatch):
+    monkeypatch.setattr(b.compression, '_CHUNK_BYTES', 1000)
+
+    # Highly compressed data is decompressed a chunk at a time rather than
+    # all at once
+    data = b'\0' * 100000
+    compressed_data = [gzip_compress(data)]
+
+    # Python 2's bz2 can't limit how much it decompresses at once
+    if hasattr(bz2.BZ2Decompressor(), 'needs_input'):
+        compressed_data.append(bz2.compress(data))
+
+    if lzma is not None:
+        compressed_data.append(lzma.compress(data))
+
+    for compressed in compressed_data:
+        for source in (compressed, io.BytesIO(compressed)):
+            chunks = [bytes(chunk) for chunk in b.stream_chunks(source)]
+
+            assert b''.join(chunks) == data
+            assert max(len(chunk) for chunk in chunks) <= 1000
+
+
+def test_scan_compressed_variable_length_records(monkeypatch):
+    monkeypatch.setattr(b.compression, '_CHUNK_BYTES', 3)
+
+    instrument = [
+        ("instrument_type", b.enum(8, {
+            0: 'pulse',
+            1: 'wave'
+        })),
+        (b.CONDITIONAL, "instrument_type", {
+            "pulse": [("envelope", b.byte)],
+            "wave": [("volume", b.byte), ("synth", b.byte)]
+        })
+    ]
+
+    data = bytes(bytearray([0, 0xa8, 1, 3, 4, 0, 0xb2, 1, 5, 6]))
+
+    waves = list(b.scan(gzip_compress(data), instrument,
+                        where={"instrument_type": 'wave'}))
+
+    assert [(x.volume, x.synth) for x in waves] == [(3, 4), (5, 6)]
+
+    # xz's magic bytes are longer than a chunk
+    compress = bz2.compress if lzma is None else lzma.compress
+
+    assert list(b.scan(
+        io.BytesIO(compress(data)), instrument,
+        where={"instrument_type": 'pulse'}, offsets=True)) == [0, 5]
+
+    with pytest.raises(ValueError):
+        list(b.iter_parse(gzip_compress(data[:-1]), instrument))
+
+
+def test_windowed_bits():
+    spec = [
+        {"endianness": b.BIG_ENDIAN},
+        ("num_samples", b.uint32),
+        ("samples", b.array(100000, [{"endianness": b.BIG_ENDIAN},
+                                     ("time", b.uint16),
+                                     ("value", b.int16)]))
+    ]
+
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'samples.bin')
+
+    with open(path, 'wb') as fp:
+        fp.write(struct.pack('>I', 100000))
+
+        for i in range(100000):
+            fp.write(struct.pack('>Hh', i % 65536, -i % 1000))
+
+    with b.WindowedBits(path, window_bytes=4096, max_windows=4) as data:
+        parsed = b.parse(data, spec)
+
+        assert parsed.num_samples == 100000
+        assert parsed.samples[99999].time == 99999 % 65536
+        assert parsed.samples[50000].value == -50000 % 1000
+        assert parsed.samples[1].value == -1 % 1000
+
+        # Only the windows and items that were accessed have been read
+        assert data.faults <= 4
+        assert len(data._windows) <= 4
+        assert len(parsed.samples._accessor_items) <= 4
+
+        for i in range(0, 100000, 1000):
+            assert parsed.samples[i].time == i % 65536
+
+        assert len(data._windows) == 4
+
+        with pytest.raises(ValueError):
+            parsed.num_samples = 1
+
+        with open(path, 'rb') as fp:
+            assert b.write(parsed) == fp.read()
+
+
+def test_compile_layout_spec_changes():
+    spec = [("a", b.uint8)]
+
+    assert list(b.compile_layout(spec).leaves) == ['a']
+
+    # Changing a spec in place changes its layout
+    spec.append(("c", b.uint8))
+
+    assert list(b.compile_layout(spec).leaves) == ['a', 'c']
+    assert [x.as_native() for x in b.iter_parse(bytearray([1, 2]), spec)] == [
+        {"a": 1, "c": 2}]
+
+    # Only so many layouts are kept
+    for i in range(1000):
+        b.compile_layout([("x", b.uint8), ("y%d" % i, b.uint8)])
+
+    assert len(b.layout._layout_cache) <= 256
+
+
+def test_lazy_imports():
+    if sys.version_info < (3, 7):
+        pytest.skip("modules are only imported lazily on Python 3.7+")
+
+    # Importing bread and writing specs doesn't import bitstring, the
+    # vendored six or bread's parsing, scanning and NumPy modules
+    script = '\n'.join([
+        'import sys',
+        'import bread as b',
+        'spec = [("a", b.uint8), ("b", b.array(2, b.string(1))),',
+        '        ("c", b.enum(8, {0: "x"}))]',
+        'print(" ".join(sorted(sys.modules)))',
+        'assert b.parse(bytearray(b"\\x01ab\\x00"), spec).a == 1',
+        'print(" ".join(sorted(sys.modules)))'
+    ])
+
+    output = subprocess.check_output(
+        [sys.executable, '-c', script],
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    modules_after_import, modules_after_parse = [
+        set(line.split()) for line in output.decode('utf-8').splitlines()]
+
+    for module in ['bitstring', 'bread.vendor.six', 'bread.lifecycle',
+                   'bread.records', 'bread.columns', 'numpy',
+                   'concurrent.futures']:
+        assert module not in modules_after_import
+
+    assert 'bread.lifecycle' in modules_after_parse
+    assert 'bitstring' in modules_after_parse
+
+    # Names from modules that haven't been imported yet are still available
+    assert 'parse' in dir(b)
+    assert b.compile_layout is b.layout.compile_layout
+
+
+def test_clone():
+    spec = [
+        ("kind", b.uint8),
+        (b.CONDITIONAL, "kind", {
+            0: [("small", b.uint8)],
+            1: [("large", b.uint16)]}),
+        ("count", b.uint8),
+        ("items", b.array("count", [("volume", b.uint8),
+                                    ("name", b.cstring(4))])),
+        ("header", [("id", b.uint8), ("flags", b.uint8)])
+    ]
+
+    data = bytes(bytearray([1, 5, 0, 2, 10, 0x61, 0, 20, 0x62, 0, 7, 8]))
+    template = b.parse(data, spec, frozen=True)
+
+    clone = template.clone()
+
+    assert clone == template
+    assert clone.as_native() == template.as_native()
+
+    # The clone shares the template's data until it's changed
+    assert not clone._data_bits.copied
+
+    # memoryview.obj isn't available on Python 2
+    if hasattr(memoryview, 'obj'):
+        assert (clone._data_bits.byte_view(0, 8).obj is
+                template._data_bits.byte_view(0, 8).obj)
+
+    clone.large = 6
+    clone.items[1].volume = 21
+    clone.header.id = 9
+
+    assert clone._data_bits.copied
+    assert template.large == 5
+    assert template.items[1].volume == 20
+    assert template.header.id == 7
+    assert clone.large == 6
+    assert clone.header.id == 9
+
+    assert b.write(clone) == bytearray(
+        [1, 6, 0, 2, 10, 0x61, 0, 21, 0x62, 0, 9, 8])
+
+    # Clones of clones that have been changed get their own copy of the data
+    other_clone = clone.clone()
+    other_clone.kind = 0
+
+    assert other_clone.small == 6
+    assert clone.large == 6
+
+    # Changes to structs that aren't frozen aren't seen by their clones
+    mutable = b.parse(bytearray(data), spec)
+    mutable_clone = mutable.clone()
+    mutable.large = 1
+
+    assert mutable_clone.large == 5
+    assert not isinstance(mutable_clone._data_bits, b.CopyOnWriteBits)
+
+    mutable_clone.large = 2
+
+    assert mutable_clone.large == 2
+    assert mutable.large == 1
+
+    # Sub-structs can be cloned on their own
+    header = template.header.clone()
+
+    assert header.as_native() == {"id": 7, "flags": 8}
+
+    header.flags = 1
+
+    assert b.write(header) == bytearray([7, 1])
+    assert template.header.flags == 8